@@ -1,4 +1,8 @@
+import time
 from web3 import Web3
+from snapshot_store import SnapshotStore
+from block_watcher import BlockWatcher
+from amount_format import format_units, format_compact, summarize
 
 # RPCノードへの接続（Arbitrumの場合）
 RPC_URL = "https://arb1.arbitrum.io/rpc"
@@ -88,41 +92,130 @@ def get_decimals(contract):
 def get_token_balance(address):
     balance = token_contract.functions.balanceOf(address).call()  # トークン残高取得
     decimals = get_decimals(token_contract)  # 小数点の桁数
-    return balance / (10 ** decimals)
+    return format_units(balance, decimals)
 
 print(f"token残高: {get_token_balance(user_address)} ")
 
 ## 発行量
-def format_large_number(number):
-    if number >= 10**9:
-        return f"{number / 10**9:.1f}b"
-    elif number >= 10**6:
-        return f"{number / 10**6:.1f}m"
-    elif number >= 10**3:
-        return f"{number / 10**3:.1f}k"
-    else:
-        return str(number)
-
 def get_total_supply(token_contract):
-    total_supply = token_contract.functions.totalSupply().call()
-    decimals = get_decimals(token_contract)  
-    return total_supply / (10 ** decimals)
+    return token_contract.functions.totalSupply().call()  # raw値
 
 total_supply = get_total_supply(token_contract)
+decimals = get_decimals(token_contract)
 
-print(f"トークン総供給量: {total_supply}")
-print(f"トークン総供給量を略で観: {format_large_number(total_supply)}")
+print(f"トークン総供給量: {format_units(total_supply, decimals)}")
+print(f"トークン総供給量を略で観: {format_compact(total_supply, decimals)}")
 
 # 指定したアドレスが特定のアドレスに承認したトークン量
 def get_allowance(owner, spender, token_contract):
     allowance = token_contract.functions.allowance(owner, spender).call()
     decimals = get_decimals(token_contract)
-    return allowance / (10 ** decimals)
+    return format_units(allowance, decimals)
 
 # 対象となるContract(sushiswapV3routerアドレス)
 spender_address = "0xf2614A233c7C3e7f08b1F887Ba133a13f1eb2c55" 
 print(f"Sushiswapに承認したトークン量: {get_allowance(user_address, spender_address, token_contract)}")
 
+# ========================================
+# スナップショットモード
+# 上記の値を複数ウォレット・トークンについてブロックごとに記録する
+# （SNAPSHOT_DIR に列指向で追記。履歴は SnapshotStore.query / aggregate で検索）
+# ========================================
+SNAPSHOT_MODE = False
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_INTERVAL_SECOND = 12  # 記録間隔（同じブロックは記録しない）
+SNAPSHOT_WALLETS = [user_address]
+SNAPSHOT_TOKENS = [ERC20_CONTRACT_ADDRESS]
+SNAPSHOT_SPENDERS = [spender_address]
+
+def record_snapshot(store, block, token_contracts, token_decimals):
+    # 指定ブロック時点の値を全て読み、1ブロック分として追記する（値は全てraw値）
+    block_number = block['number']
+    rows = [("gas_price", "", None, w3.eth.gas_price)]
+    for wallet in SNAPSHOT_WALLETS:
+        rows.append(("nonce", wallet, None, w3.eth.get_transaction_count(wallet, block_number)))
+        rows.append(("balance", wallet, None, w3.eth.get_balance(wallet, block_number)))
+    for token_address, contract in token_contracts.items():
+        if store.series_id("decimals", "", token_address) is None:
+            # decimalsは変わらないので初回のみ記録する
+            rows.append(("decimals", "", token_address, token_decimals[token_address]))
+        rows.append(("total_supply", "", token_address, contract.functions.totalSupply().call(block_identifier=block_number)))
+        for wallet in SNAPSHOT_WALLETS:
+            rows.append(("token_balance", wallet, token_address, contract.functions.balanceOf(wallet).call(block_identifier=block_number)))
+            for spender in SNAPSHOT_SPENDERS:
+                rows.append((f"allowance:{spender}", wallet, token_address, contract.functions.allowance(wallet, spender).call(block_identifier=block_number)))
+    store.append(block_number, block['timestamp'], rows)
+    return len(rows)
+
+def run_snapshot_mode():
+    store = SnapshotStore(SNAPSHOT_DIR)
+    token_contracts = {address: w3.eth.contract(address=address, abi=CONTRACT_ABI) for address in SNAPSHOT_TOKENS}
+    # decimalsは変わらないので最初に1回だけ取得する
+    token_decimals = {address: get_decimals(contract) for address, contract in token_contracts.items()}
+    last_block_number = None
+    while True:
+        block = w3.eth.get_block('latest')
+        if block['number'] != last_block_number:
+            count = record_snapshot(store, block, token_contracts, token_decimals)
+            print(f"スナップショット記録: ブロック {block['number']}, {count} 件")
+            last_block_number = block['number']
+        time.sleep(SNAPSHOT_INTERVAL_SECOND)
+
+if SNAPSHOT_MODE:
+    run_snapshot_mode()
+
+# ========================================
+# ウォッチモード
+# 上記の値を最初に1回だけ全て読み、以降は新しいブロックで変化した値だけを表示する
+# （ブロック内のトランザクションとTransfer/Approvalログから、触られたアドレスの値だけ読み直す）
+# ========================================
+WATCH_MODE = False
+WATCH_INTERVAL_SECOND = 2
+WATCH_FULL_REFRESH_BLOCKS = 100  # 内部トランザクションによるネイティブ残高の変化を拾うため、定期的に全て読み直す
+WATCH_WALLETS = [user_address]
+WATCH_TOKENS = [ERC20_CONTRACT_ADDRESS]
+WATCH_SPENDERS = [spender_address]
+WATCH_TX_HASHES = []  # 取り込まれるまで監視するトランザクション
+WATCH_TRACK_NATIVE = True  # Falseならブロック本体を取得しない（nonce・ETH残高は全体の読み直し時のみ更新）
+
+def format_watch_value(key, value, token_decimals):
+    # ネイティブ残高はether、トークンの値はdecimalsで変換して表示する
+    if value is None:
+        return "なし"
+    if key[0] == "balance":
+        return f"{w3.from_wei(value, 'ether')} ETH"
+    if key[0] in ("total_supply", "token_balance", "allowance"):
+        return format_units(value, token_decimals[key[1]])
+    if key[0] == "base_fee":
+        return f"{w3.from_wei(value, 'gwei')} Gwei"
+    return f"{value}"
+
+def run_watch_mode():
+    watcher = BlockWatcher(w3, WATCH_WALLETS, WATCH_TOKENS, WATCH_SPENDERS, WATCH_TX_HASHES,
+                           full_refresh_blocks=WATCH_FULL_REFRESH_BLOCKS, track_native=WATCH_TRACK_NATIVE)
+    # decimalsは変わらないので最初に1回だけ取得する
+    token_decimals = {token: get_decimals(contract) for token, contract in watcher.tokens.items()}
+    values = watcher.start()
+    for key, value in values.items():
+        print(f"{key}: {format_watch_value(key, value, token_decimals)}")
+    # 全ウォレットのトークン残高をトークンごとに合計して表示する
+    balances = [(key[1], value) for key, value in values.items() if key[0] == "token_balance"]
+    totals = summarize([value for _, value in balances], [token for token, _ in balances], token_decimals)
+    for token, total in totals.items():
+        print(f"合計残高 {token}: {total['formatted']} ({total['compact']}, {total['count']} ウォレット)")
+    for tx_hash, tx in watcher.transactions.items():
+        print(f"トランザクション情報 {tx_hash}: {tx}")
+
+    def print_diffs(diffs):
+        for block_number, key, old, new in diffs:
+            print(f"[ブロック {block_number}] {key}: "
+                  f"{format_watch_value(key, old, token_decimals)} -> {format_watch_value(key, new, token_decimals)}")
+
+    watcher.run(WATCH_INTERVAL_SECOND, print_diffs)
+
+if WATCH_MODE:
+    run_watch_mode()
+
 # ========================================
 # 指定したトランザクションの詳細情報
 def get_transaction(tx_hash):
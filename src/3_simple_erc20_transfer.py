@@ -1,7 +1,7 @@
 import os
 from web3 import Web3
 from dotenv import load_dotenv
-from decimal import Decimal, getcontext
+from amount_format import format_units_many, parse_units
 
 load_dotenv()
 
@@ -19,7 +19,7 @@ recipient = "0xRecipientAddressHere"  # 送金先アドレスを設定
 USDT_ADDRESS = "0x55d398326f99059fF775485246999027B3197955"
 
 # 送金額（decimal考慮前で良い）
-amount_usdt = 0.001
+amount_usdt = "0.001"  # floatは誤差を含むため文字列で指定する
 
 # bscのチェーンID（未指定の場合は内部でデフォルト値を採用）
 default_chain_id = 56
@@ -76,9 +76,8 @@ def print_token_balances(token_contract, sender, receiver, label="トークン
     sender_balance = token_contract.functions.balanceOf(sender).call()
     receiver_balance = token_contract.functions.balanceOf(receiver).call()
     
-    # Decimalで整形（例: USDTなら小数点以下6桁）
-    sender_formatted = Decimal(sender_balance) / (10 ** decimals)
-    receiver_formatted = Decimal(receiver_balance) / (10 ** decimals)
+    # decimalsで整形（例: USDTなら小数点以下6桁）
+    sender_formatted, receiver_formatted = format_units_many([sender_balance, receiver_balance], decimals)
 
     print(f"{label}確認:")
     print(f"  Sender ({sender}): {sender_formatted} (raw: {sender_balance})")
@@ -109,10 +108,10 @@ def create_token_transaction(sender, receiver, token_contract, amount, chain_id=
     tx['gasPrice'] = gas_price
 
     decimals = get_decimals(token_contract)
-    # Decimalを利用して送金額を単位変換
+    # 送金額をraw値に変換
     # 例えば、amountが "1.5" USDT で decimals が6なら、
-    # converted_amount = int(Decimal("1.5") * (10 ** 6)) → 1500000
-    converted_amount = int(Decimal(amount) * (10 ** decimals))
+    # converted_amount = parse_units("1.5", 6) → 1500000
+    converted_amount = parse_units(amount, decimals)
     print(f"Amount: {amount}, Converted Amount: {converted_amount}")
 
     transfer_tx = token_contract.functions.transfer(receiver, converted_amount).build_transaction(tx)
@@ -2,7 +2,9 @@ import os
 import logging
 import time
 from web3 import Web3
+from web3.exceptions import TimeExhausted
 from dotenv import load_dotenv
+from receipt_decoder import claimed_rewards
 
 # ログの設定：INFOレベルのログを出力する
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +27,10 @@ POOL_IDs = [1]  # プールID SHELDの scUASD/SHIELD=0, scUSD=1
 # 繰り返し時間
 INTERVAL_SECOND = 90  # 60s毎にClaimする
 
+# harvestAll対応のコントラクト（contract/Quant/genesisRewordPoolBatch.sol）の場合はTrue
+# Trueにすると POOL_IDs 全てを1トランザクションでClaimする
+USE_HARVEST_ALL = False
+
 # withdraw関数のABI（GenesisRewardPoolのwithdraw関数は2つのuint256型引数を取ります）
 WITHDRAW_ABI = [
     {
@@ -36,6 +42,15 @@ WITHDRAW_ABI = [
         "outputs": [],
         "stateMutability": "nonpayable",
         "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "uint256[]", "name": "_pids", "type": "uint256[]"}
+        ],
+        "name": "harvestAll",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
     }
 ]
 
@@ -87,46 +102,41 @@ def get_contract_instance(web3: Web3, contract_address: str, abi: list):
     return web3.eth.contract(address=checksum_address, abi=abi)
 
 
-def build_withdraw_transaction(web3: Web3, contract, account_address: str, pid: int, amount: int) -> dict:
-    
-    # withdraw関数を呼び出すためのトランザクションを構築する関数
-    # ・最新ブロックからBase Fee（baseFeePerGas）を取得し、
-    #   MaxPriorityFeePerGas（優先ガス料金）を「BaseFee + 10 Gwei」と設定
-    # ・GasリミットはestimateGas()の値に20%のバッファーを追加
-    # ・MaxFeePerGasはMaxPriorityFeePerGasの1.2倍に設定（上限値として機能）
-    # Args:
-    #     web3 (Web3): Web3インスタンス
-    #     contract: コントラクトインスタンス
-    #     account_address (str): トランザクション送信元アドレス
-    #     pid (int): プールID（_pid）
-    #     amount (int): 引き出し額（_amount, 0の場合pending報酬のみClaimされる）
-    # Returns:
-    #     tx (dict): 署名前のトランザクション辞書
-
-    logger.info("Withdraw実行: Pool ID: %d, Amount: %d", pid, amount)
-
+def get_fee_params(web3: Web3) -> (int, int):
+    """
+    最新ブロックのBase Feeから (maxFeePerGas, maxPriorityFeePerGas) を計算する関数
+    ・MaxPriorityFeePerGas（優先ガス料金）を「BaseFee + 5 Gwei」と設定
+    ・MaxFeePerGasはMaxPriorityFeePerGasの1.2倍に設定（上限値として機能）
+    """
     # 最新ブロックからbaseFeePerGasを取得（EIP-1559対応のチェーンの場合）
     latest_block = web3.eth.get_block('latest')
     base_fee = latest_block['baseFeePerGas']
-    # 優先料金（Tip）:BaseFeeに10 Gweiを加算して設定（ここで+10 Gweiとする例）
+    # 優先料金（Tip）:BaseFeeに5 Gweiを加算して設定
     add_gwei = web3.to_wei(5, 'gwei')
     max_priority_fee = base_fee + add_gwei
     # 最大ガス料金（MaxFeePerGas）は、優先ガスの1.2倍とする
     max_fee = int(max_priority_fee * 1.2)
+    return max_fee, max_priority_fee
+
+
+def build_contract_transaction(web3: Web3, contract_function, account_address: str) -> dict:
+    """
+    コントラクト関数呼び出しのトランザクションを構築する関数
+    ・GasリミットはestimateGas()の値に20%のバッファーを追加
+    """
+    max_fee, max_priority_fee = get_fee_params(web3)
     # ガスリミットの見積もり（トランザクションの実行に必要なGasの単位）
-    gas_estimate = contract.functions.withdraw(pid, amount).estimate_gas({'from': account_address})
+    gas_estimate = contract_function.estimate_gas({'from': account_address})
     # バッファとして20%増しのガスリミットを設定
     gas_limit = int(gas_estimate * 1.2)
 
-    # logger.info("最新ブロックのBase Fee: %s Gwei", web3.from_wei(base_fee, 'gwei'))
     # logger.info("設定するMax Priority Fee: %s Gwei", web3.from_wei(max_priority_fee, 'gwei'))
     # logger.info("設定するMax Fee: %s Gwei", web3.from_wei(max_fee, 'gwei'))
     # logger.info("Gas Estimate: %d gas units (バッファ込み: %d)", gas_estimate, gas_limit)
 
     # 送信元アカウントのnonceを取得（同一アドレスからのトランザクションのカウント）
     nonce = web3.eth.get_transaction_count(account_address)
-    # withdraw関数呼び出しのトランザクションをビルド
-    tx = contract.functions.withdraw(pid, amount).build_transaction({
+    tx = contract_function.build_transaction({
         'chainId': CHAIN_ID,                  # SonicチェーンのchainId
         'gas': gas_limit,                     # ガスリミット（estimateGas()に20%バッファー）
         'maxFeePerGas': max_fee,              # 最大ガス料金（上限として設定）
@@ -139,6 +149,38 @@ def build_withdraw_transaction(web3: Web3, contract, account_address: str, pid:
     return tx
 
 
+def build_withdraw_transaction(web3: Web3, contract, account_address: str, pid: int, amount: int) -> dict:
+    
+    # withdraw関数を呼び出すためのトランザクションを構築する関数
+    # Args:
+    #     web3 (Web3): Web3インスタンス
+    #     contract: コントラクトインスタンス
+    #     account_address (str): トランザクション送信元アドレス
+    #     pid (int): プールID（_pid）
+    #     amount (int): 引き出し額（_amount, 0の場合pending報酬のみClaimされる）
+    # Returns:
+    #     tx (dict): 署名前のトランザクション辞書
+
+    logger.info("Withdraw実行: Pool ID: %d, Amount: %d", pid, amount)
+    return build_contract_transaction(web3, contract.functions.withdraw(pid, amount), account_address)
+
+
+def build_harvest_all_transaction(web3: Web3, contract, account_address: str, pids: list) -> dict:
+
+    # harvestAll関数を呼び出すためのトランザクションを構築する関数
+    # 複数プールのpending報酬を1トランザクションでClaimする（報酬の送金も1回にまとめられる）
+    # Args:
+    #     web3 (Web3): Web3インスタンス
+    #     contract: コントラクトインスタンス
+    #     account_address (str): トランザクション送信元アドレス
+    #     pids (list): プールIDのリスト
+    # Returns:
+    #     tx (dict): 署名前のトランザクション辞書
+
+    logger.info("HarvestAll実行: Pool IDs: %s", pids)
+    return build_contract_transaction(web3, contract.functions.harvestAll(pids), account_address)
+
+
 def sign_and_send_transaction(web3: Web3, tx: dict, private_key: str) -> str:
     # トランザクションに署名し、ネットワークに送信する関数
     # Args:
@@ -156,6 +198,19 @@ def sign_and_send_transaction(web3: Web3, tx: dict, private_key: str) -> str:
     return web3.to_hex(tx_hash)
 
 
+def wait_for_claim_result(web3: Web3, tx_hash: str, account_address: str):
+    # トランザクションの完了を待ち、レシートのRewardPaidログからClaimした報酬量（raw値）を返す
+    # 時間内に取り込まれなかった場合はログだけ出してNoneを返す（Claimのループは止めない）
+    try:
+        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+    except TimeExhausted as e:
+        logger.warning("トランザクションの完了を確認できませんでした: %s, %s", Web3.to_hex(tx_hash), e)
+        return None
+    claimed = claimed_rewards(receipt, GENESIS_POOL_CONTRACT_ADDRESS, account_address)
+    logger.info("ステータス: %s, Claimした報酬量(raw): %d", receipt['status'], claimed)
+    return claimed
+
+
 def main():
     # RPC接続とアカウントの設定
     web3 = connect_to_rpc(RPC_URL)
@@ -167,14 +222,22 @@ def main():
     # POOL_IDs = [0,3]とした時に1分毎にClaimする
     # POOL_IDs = [0,3]とした時に30秒毎にClaimする
     while True:
-        for pid in POOL_IDs:
-            # withdraw関数（poolId: pid, amount: 0）のトランザクションを構築
-            # ここで、_pid = pid と _amount = 0 を指定すると、LPトークンの残高は変化せず、
-            # pending報酬（QUANT）がClaimされます。
-            tx = build_withdraw_transaction(web3, contract, account_address, pid=pid, amount=0)
-            # 署名済みトランザクションを生成し、ネットワークに送信する
+        if USE_HARVEST_ALL:
+            # POOL_IDs 全てのpending報酬を1トランザクションでClaimする
+            tx = build_harvest_all_transaction(web3, contract, account_address, pids=POOL_IDs)
             tx_hash = sign_and_send_transaction(web3, tx, private_key)
-            print(f"Pool ID: {pid} のトランザクションハッシュ:", tx_hash)
+            print(f"Pool IDs: {POOL_IDs} のトランザクションハッシュ:", tx_hash)
+            wait_for_claim_result(web3, tx_hash, account_address)
+        else:
+            for pid in POOL_IDs:
+                # withdraw関数（poolId: pid, amount: 0）のトランザクションを構築
+                # ここで、_pid = pid と _amount = 0 を指定すると、LPトークンの残高は変化せず、
+                # pending報酬（QUANT）がClaimされます。
+                tx = build_withdraw_transaction(web3, contract, account_address, pid=pid, amount=0)
+                # 署名済みトランザクションを生成し、ネットワークに送信する
+                tx_hash = sign_and_send_transaction(web3, tx, private_key)
+                print(f"Pool ID: {pid} のトランザクションハッシュ:", tx_hash)
+                wait_for_claim_result(web3, tx_hash, account_address)
         logger.info(" %s 秒待機中...",INTERVAL_SECOND)
         time.sleep(INTERVAL_SECOND)
 
@@ -5,6 +5,11 @@ from web3 import Web3
 from eth_account import Account
 from decimal import Decimal
 from dotenv import load_dotenv
+from block_cache import BlockStateCache
+from allowance_manager import AllowanceManager
+from split_optimizer import fetch_pool_state, check_split_pools, optimize_split, build_split_swaps
+from receipt_decoder import received_amount
+from amount_format import format_units
 
 # ログの設定：INFOレベルのログを出力する
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +29,16 @@ SWAP_ADDRESS = Web3.to_checksum_address("0xA047e2AbF8263FcA7c368F43e2f960A06FD99
 
 SLLIPAGE_PERCENT = 5  # 1%スリッページ、100なら無限
 
+# approveの方針: "max"ならuint256最大値をapproveし、以降のapproveを不要にする
+APPROVAL_POLICY = "max"
+# allowanceキャッシュの保存先（実行をまたいでallowanceのRPCを省略する）
+ALLOWANCE_CACHE_PATH = "allowance_cache.json"
+
+# 分割スワップ: 同じペアのプール（stable/volatile）と手数料(bps)のリスト。空なら下記の単一ルートでスワップ
+# 例: [("0xvolatileプールCA", 30), ("0xstableプールCA", 5)]
+SPLIT_POOLS = []
+SPLIT_MIN_GAIN = 0  # 分割による受取量の増加（toTokenのraw値）がこれ以下なら分割しない
+
 TOKEN_ABI = [
     {
         "name": "approve",
@@ -88,6 +103,11 @@ token = w3.eth.contract(address=Web3.to_checksum_address(TOKEN_ADDRESS), abi=TOK
 to_token = w3.eth.contract(address=Web3.to_checksum_address(TO_TOKEN_ADDRESS), abi=TOKEN_ABI)
 swap = w3.eth.contract(address=Web3.to_checksum_address(SWAP_ADDRESS), abi=SWAP_ABI)
 
+# ブロックハッシュ単位の状態キャッシュ（reorg時は巻き戻されたブロックの値のみ破棄）
+state_cache = BlockStateCache(w3)
+# allowanceのキャッシュ（Approvalイベントで破棄、スワップ送信ごとにローカルで減算）
+allowance_manager = AllowanceManager(w3, wallet_address, approval_policy=APPROVAL_POLICY, cache_path=ALLOWANCE_CACHE_PATH)
+
 # ========== ユーティリティ関数 ==========
 def get_nonce():
     return w3.eth.get_transaction_count(wallet_address)
@@ -104,35 +124,44 @@ def send_tx(signed):
     except Exception as e:
         print(f"Error sending transaction: {e}")
 
+def get_balance(token_contract, address, block_hash=None):
+    # 指定ブロック（省略時はキャッシュの先頭ブロック）時点の残高をキャッシュ経由で取得する
+    return state_cache.get_or_fetch(
+        ("balanceOf", token_contract.address, address),
+        lambda block_hash: token_contract.functions.balanceOf(address).call(block_identifier=block_hash),
+        block_hash,
+    )
+
 def get_decimals(token_contract):
     try:
         return token_contract.functions.decimals().call()
     except:
         return 18  # fallback（ERC20標準がない場合）
 
-def ensure_approval(swap_address, amount):
-    # 現在のガス価格を取得
-    gas_price = w3.eth.gas_price
-    logger.info("Current gas price: %s", gas_price)
-    # トランザクションの作成
-    tx = {
-        'to': swap_address,
-        'value': 0,
-        'gas': 200000,  # 適切なガスリミットを設定d
-        'gasPrice': gas_price,  # 現在のガス価格を設定
-        'nonce': w3.eth.get_transaction_count(wallet_address),
-        'data': token.functions.approve(swap_address, amount).build_transaction({
-            'gas': 200000,
-            'gasPrice': gas_price,
-            'nonce': w3.eth.get_transaction_count(wallet_address),
-        })['data'],
-    }
+def ensure_approval(swap_address, amount, nonce, fee_params):
+    """
+    approveトランザクションを送信し、tx hashを返す（構築・送信に失敗した場合はNone）
+    """
+    # approveトランザクションを構築する（calldataは直接エンコード、gasはestimate_gasから算出）
+    try:
+        tx = allowance_manager.build_approve_tx(TOKEN_ADDRESS, swap_address, amount, {
+            'chainId': CHAIN_ID,
+            'nonce': nonce,
+            **fee_params,
+        })
+    except Exception as e:
+        logger.error("approveトランザクションの構築に失敗しました: %s", e)
+        return None
+    logger.info("Approve量: %s", allowance_manager.approval_amount(amount))
 
     # トランザクションに署名
     signed = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
     
     # トランザクションを送信
-    send_tx(signed)
+    tx_hash = send_tx(signed)
+    if tx_hash is not None:
+        allowance_manager.record_approval(TOKEN_ADDRESS, swap_address, allowance_manager.approval_amount(amount))
+    return tx_hash
 
 # ========== Sllipage計算 ==========
 def get_amount_out_min(from_amount, from_token_address, to_token_address, is_stable, slippage_percent):
@@ -173,108 +202,132 @@ def get_amount_out_min(from_amount, from_token_address, to_token_address, is_sta
 # ========== Swap実行 ==========
 
 def swap_all_balance():
+    # 最新ブロックを取得し、以降の読み出しはこのブロック時点にそろえる
+    latest_block = state_cache.update_head()
+
     # fromTokenの残高を取得
-    from_balance = token.functions.balanceOf(wallet_address).call()
+    from_balance = get_balance(token, wallet_address)
     from_decimals = get_decimals(token)
-    formatted_from_balance = from_balance / 10 ** from_decimals
+    formatted_from_balance = format_units(from_balance, from_decimals)
     logger.info("Swap対象(from)トークンの残高: %s ,CA: %s", formatted_from_balance, TOKEN_ADDRESS)
 
     # スワップに使用する量 
     swap_amount = from_balance
-    formatted_swap_amount = swap_amount / 10 ** from_decimals
+    formatted_swap_amount = format_units(swap_amount, from_decimals)
     logger.info("実際にスワップする量: %s ,CA: %s", formatted_swap_amount, TOKEN_ADDRESS)
 
-    # 承認の確認
-    current_allowance = token.functions.allowance(wallet_address, SWAP_ADDRESS).call()
-    formatted_allowance = current_allowance / 10 ** from_decimals
-    logger.info("Current allowance: %s ,CA: %s", formatted_allowance, TOKEN_ADDRESS)
+    # ガス設定
+    base_fee = latest_block['baseFeePerGas']
+    add_gwei = w3.to_wei(5, 'gwei')
+    max_priority_fee = base_fee + add_gwei
+    max_fee = int(max_priority_fee * 1.2)
+    fee_params = {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": max_priority_fee}
 
-    if swap_amount > current_allowance:
+    # nonceは1回だけ取得し、approveを送った場合は+1してスワップに使う
+    nonce = get_nonce()
+
+    # 承認の確認（キャッシュで足りていればRPCもapproveも不要）
+    allowance_manager.sync(latest_block['number'])
+    if allowance_manager.needs_approval(TOKEN_ADDRESS, SWAP_ADDRESS, swap_amount):
         logger.info("Approving %s トークン...", formatted_swap_amount)
-        ensure_approval(SWAP_ADDRESS, swap_amount)
+        if ensure_approval(SWAP_ADDRESS, swap_amount, nonce, fee_params) is None:
+            # approveが送れていないままスワップを送るとnonceが空いて取り込まれないため中止する
+            logger.error("approveを送信できなかったため、スワップを中止します")
+            return
+        nonce += 1
 
     logger.info("Approval 済み")
     
-    # toTokenの前残高の取得
+    # 受取量はレシートのTransferログから計算するため、toTokenの前残高は取得しない
     to_decimals = get_decimals(to_token)
-    before_to_balance = to_token.functions.balanceOf(wallet_address).call()
-    formatted_before_to_balance = before_to_balance / 10 ** to_decimals
-    logger.info("Swap前のtoToken残高: %s ,CA: %s", formatted_before_to_balance, TO_TOKEN_ADDRESS)
-
-    # ガス設定
-    latest_block = w3.eth.get_block('latest')
-    base_fee = latest_block['baseFeePerGas']
-    add_gwei = w3.to_wei(5, 'gwei')
-    max_priority_fee = base_fee + add_gwei
-    max_fee = int(max_priority_fee * 1.2)
 
     logger.info("Swap開始: fromToken: %s, toToken: %s", TOKEN_ADDRESS, TO_TOKEN_ADDRESS)
 
-    # ルート設定
-    # is_stable = True  # stable
-    is_stable = False  # not stable
-    routes = [(
-        TOKEN_ADDRESS,
-        TO_TOKEN_ADDRESS,
-        is_stable
-    )]
-    logger.info("routes: %s", routes)
-
-    # 改善されたスリッページ計算
-    # amountOutMin = get_amount_out_min(
-    #     swap_amount, 
-    #     TOKEN_ADDRESS, 
-    #     TO_TOKEN_ADDRESS, 
-    #     is_stable, 
-    #     SLLIPAGE_PERCENT
-    # )
-    
-    amountOutMin=0
-    
-    # ログ出力用にフォーマット
-    formatted_amount_out_min = amountOutMin / 10 ** to_decimals
-    logger.info("スリッページ設定: %s%%, 最小受取量(toToken単位): %s ,CA: %s", 
-                SLLIPAGE_PERCENT, formatted_amount_out_min, TO_TOKEN_ADDRESS)
-
-    # トランザクション作成
-    tx = swap.functions.swapExactTokensForTokens(
-        swap_amount,
-        amountOutMin,
-        routes,
-        wallet_address
-    ).build_transaction({
-        'from': wallet_address,
-        'chainId': CHAIN_ID,
-        'nonce': get_nonce(),
-        'gas': 3000000,
-        "maxFeePerGas": max_fee,
-        "maxPriorityFeePerGas": max_priority_fee,
-    })
-    logger.info("Transaction data: %s", tx)
-
-    # トランザクション署名と送信
-    signed = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = send_tx(signed)
+    if SPLIT_POOLS:
+        # 各プールのリザーブから受取量が最大になる配分を計算し、プールごとにスワップする
+        pools = [fetch_pool_state(w3, address, fee_bps, latest_block['hash']) for address, fee_bps in SPLIT_POOLS]
+        check_split_pools(pools, TOKEN_ADDRESS, TO_TOKEN_ADDRESS)
+        allocations = optimize_split(pools, TOKEN_ADDRESS, swap_amount, min_gain=SPLIT_MIN_GAIN)
+        swaps = build_split_swaps(allocations, TOKEN_ADDRESS, TO_TOKEN_ADDRESS, SLLIPAGE_PERCENT)
+    else:
+        # ルート設定
+        # is_stable = True  # stable
+        is_stable = False  # not stable
+        routes = [(
+            TOKEN_ADDRESS,
+            TO_TOKEN_ADDRESS,
+            is_stable
+        )]
+
+        # 改善されたスリッページ計算
+        # amountOutMin = get_amount_out_min(
+        #     swap_amount, 
+        #     TOKEN_ADDRESS, 
+        #     TO_TOKEN_ADDRESS, 
+        #     is_stable, 
+        #     SLLIPAGE_PERCENT
+        # )
+        
+        amountOutMin=0
+        swaps = [(swap_amount, amountOutMin, routes)]
+
+    tx_hashes = []
+    for amount_in, amountOutMin, routes in swaps:
+        logger.info("routes: %s, 入力量: %s", routes, format_units(amount_in, from_decimals))
+
+        # ログ出力用にフォーマット
+        formatted_amount_out_min = format_units(amountOutMin, to_decimals)
+        logger.info("スリッページ設定: %s%%, 最小受取量(toToken単位): %s ,CA: %s", 
+                    SLLIPAGE_PERCENT, formatted_amount_out_min, TO_TOKEN_ADDRESS)
+
+        # トランザクション作成
+        tx = swap.functions.swapExactTokensForTokens(
+            amount_in,
+            amountOutMin,
+            routes,
+            wallet_address
+        ).build_transaction({
+            'from': wallet_address,
+            'chainId': CHAIN_ID,
+            'nonce': nonce,
+            'gas': 3000000,
+            **fee_params,
+        })
+        logger.info("Transaction data: %s", tx)
+
+        # トランザクション署名と送信
+        signed = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+        tx_hash = send_tx(signed)
+        if tx_hash is None:
+            break
+        allowance_manager.consume(TOKEN_ADDRESS, SWAP_ADDRESS, amount_in)
+        tx_hashes.append(tx_hash)
+        nonce += 1
+    if not tx_hashes:
+        return
     
     # トランザクション確認を待機
     print("トランザクション確認待ち...")
     try:
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
-        print(f"トランザクション確認済み。ステータス: {receipt['status']}")
-        
-        # 実行後のtoToken残高
-        after_to_balance = to_token.functions.balanceOf(wallet_address).call()
-        formatted_after_to_balance = after_to_balance / 10 ** to_decimals
-        received = after_to_balance - before_to_balance
-        formatted_received = received / 10 ** to_decimals
+        received = 0
+        for tx_hash in tx_hashes:
+            receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            print(f"トランザクション確認済み。ステータス: {receipt['status']}")
+            if receipt['status'] == 0:
+                # 失敗した場合（approveの失敗を含む）はallowanceを読み直す
+                allowance_manager.invalidate(TOKEN_ADDRESS, SWAP_ADDRESS)
+            # レシートのTransferログから受取量を計算する（他の入金と混ざらない）
+            received += received_amount(receipt, TO_TOKEN_ADDRESS, wallet_address)
+        formatted_received = format_units(received, to_decimals)
         
-        logger.info("Swap後のtoToken残高: %s ,CA: %s", formatted_after_to_balance, TO_TOKEN_ADDRESS)
         logger.info("受け取ったトークン量: %s ,CA: %s", formatted_received, TO_TOKEN_ADDRESS)
         
         if received == 0:
             logger.warning("⚠️ スワップは成功しましたが、受け取ったトークン量が 0 でした")
     except Exception as e:
         logger.error("トランザクション待機エラー: %s", e)
+        # approveが取り込まれていない可能性があるため、送信時に記録したallowanceを破棄する
+        allowance_manager.invalidate(TOKEN_ADDRESS, SWAP_ADDRESS)
 
 # ========== 実行 ==========
 if __name__ == "__main__":
@@ -0,0 +1,414 @@
+import os
+import csv
+import re
+import logging
+from web3 import Web3
+
+# ログの設定：INFOレベルのログを出力する
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ========================================
+# GenesisRewardPool のガスベンチマーク
+# ローカルのインプロセスEVM（eth-tester + py-evm）にデプロイし、
+# プール数を増やしながら各関数のgasUsedを計測する
+#
+# 必要なパッケージ（requirements.txtには含まれない）:
+#   pip install -r requirements-benchmark.txt
+#   npm install  （package.json の @openzeppelin/contracts）
+# ========================================
+
+# ========== 設定 ==========
+CONTRACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contract")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPENZEPPELIN_PATH = os.getenv("OPENZEPPELIN_PATH", os.path.join(ROOT_DIR, "node_modules"))  # @openzeppelin を含むディレクトリ
+SOLC_VERSION = "0.8.24"
+
+# 比較対象: (ラベル, ソースファイル, コントラクト名)
+VARIANTS = [
+    ("original", "Quant/genesisRewordPool.sol", "GenesisRewardPool"),
+    ("batch", "Quant/genesisRewordPoolBatch.sol", "GenesisRewardPoolBatch"),  # mapping重複チェック + キャッシュ
+]
+MOCK_TOKEN_SOURCE = "mocks/MockERC20.sol"
+
+# 計測するプール数（コンストラクタで9プール作成されるため最小は9）
+POOL_COUNTS = [9, 50, 100, 250, 500]
+ADD_BULK_SIZE = 10  # addBulkで一度に追加するプール数
+DEPOSIT_AMOUNT = 10 ** 18  # 各プールへのデポジット量
+TIME_STEP_SECOND = 60  # 計測前に進める時間（報酬を発生させるため）
+
+REPORT_CSV = "genesis_pool_gas_report.csv"
+REPORT_MARKDOWN = "genesis_pool_gas_report.md"
+# pendingQUANTはviewのためトランザクションにならず、estimate_gasで計測する
+# （21000の基本gasを含むため、他の行のgasUsedとは直接比較できない）
+PENDING_LABEL = "pendingQUANT (estimate_gas)"
+
+# harvestAll / withdrawMany の払い出しを withdraw と比較する設定（batchバリアントのみ）
+PAYOUT_CHECK_POOLS = 20  # 比較に使うプール数
+
+
+def load_dependencies():
+    """
+    ベンチマーク用の追加パッケージ（py-solc-x, eth-tester）を読み込み、OpenZeppelinのソースがあるか確認する
+    """
+    try:
+        import solcx
+        from eth_tester import EthereumTester, PyEVMBackend
+    except ImportError as e:
+        logger.error("依存パッケージがありません: %s", e)
+        logger.error("pip install -r requirements-benchmark.txt を実行してください。")
+        exit(1)
+    if not os.path.isdir(os.path.join(OPENZEPPELIN_PATH, "@openzeppelin", "contracts")):
+        logger.error("OpenZeppelinのコントラクトがありません: %s", OPENZEPPELIN_PATH)
+        logger.error("リポジトリのルートで npm install を実行するか、OPENZEPPELIN_PATH を指定してください。")
+        exit(1)
+    return solcx, EthereumTester, PyEVMBackend
+
+
+def compile_contracts(solcx) -> dict:
+    """
+    ベンチマーク対象とモックトークンをコンパイルし、{コントラクト名: artifact} を返す
+    """
+    if SOLC_VERSION not in [str(v) for v in solcx.get_installed_solc_versions()]:
+        logger.info("solc %s をインストール中...", SOLC_VERSION)
+        solcx.install_solc(SOLC_VERSION)
+
+    sources = [os.path.join(CONTRACT_DIR, source) for _, source, _ in VARIANTS]
+    sources.append(os.path.join(CONTRACT_DIR, MOCK_TOKEN_SOURCE))
+    compiled = solcx.compile_files(
+        sources,
+        output_values=["abi", "bin", "bin-runtime"],
+        import_remappings={"@openzeppelin/": os.path.join(os.path.abspath(OPENZEPPELIN_PATH), "@openzeppelin/")},
+        allow_paths=[CONTRACT_DIR, os.path.abspath(OPENZEPPELIN_PATH)],
+        solc_version=SOLC_VERSION,
+        optimize=True,
+        optimize_runs=200,
+    )
+    # キーは "パス:コントラクト名" なのでコントラクト名だけにする
+    return {key.split(":")[-1]: artifact for key, artifact in compiled.items()}
+
+
+def get_constructor_tokens(source: str) -> list:
+    """
+    コンストラクタでadd()されるトークンアドレスをソースから取得する
+    （add()はcode.length > 0を要求するため、ローカルEVMでも事前にコードを配置しておく）
+    """
+    with open(os.path.join(CONTRACT_DIR, source)) as f:
+        return re.findall(r"IERC20\((0x[0-9a-fA-F]{40})\)", f.read())
+
+
+def create_chain(EthereumTester, PyEVMBackend, token_addresses: list, token_runtime: str):
+    """
+    指定したアドレスにMockERC20のコードを配置したローカルEVMを作成する
+    """
+    genesis_state = PyEVMBackend.generate_genesis_state(num_accounts=1)
+    for address in token_addresses:
+        genesis_state[Web3.to_bytes(hexstr=address)] = {
+            "balance": 0,
+            "nonce": 0,
+            "code": Web3.to_bytes(hexstr=token_runtime),
+            "storage": {},
+        }
+    tester = EthereumTester(PyEVMBackend(genesis_state=genesis_state))
+    w3 = Web3(Web3.EthereumTesterProvider(tester))
+    return w3, tester
+
+
+def send(w3: Web3, contract_function, sender: str) -> int:
+    """
+    トランザクションを送信し、gasUsedを返す
+    """
+    tx_hash = contract_function.transact({'from': sender})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    return receipt['gasUsed']
+
+
+def deploy(w3: Web3, artifact: dict, sender: str, *args):
+    """
+    コントラクトをデプロイしてインスタンスを返す
+    """
+    factory = w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bin"])
+    tx_hash = factory.constructor(*args).transact({'from': sender})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    return w3.eth.contract(address=receipt['contractAddress'], abi=artifact["abi"])
+
+
+def deploy_token(w3: Web3, artifacts: dict, sender: str, index: int):
+    """
+    LPトークン用のMockERC20をデプロイする
+    """
+    return deploy(w3, artifacts["MockERC20"], sender, f"LP{index}", f"LP{index}")
+
+
+def stake(w3: Web3, pool, token, user: str, pid: int):
+    """
+    ユーザーにトークンをmintし、プールにデポジットする（計測用のTVLを作る）
+    """
+    send(w3, token.functions.mint(user, DEPOSIT_AMOUNT * 10), user)
+    send(w3, token.functions.approve(pool.address, 2 ** 256 - 1), user)
+    send(w3, pool.functions.deposit(pid, DEPOSIT_AMOUNT), user)
+
+
+def advance_time(w3: Web3, tester, seconds: int = TIME_STEP_SECOND):
+    """
+    ブロックタイムスタンプを進める（次のトランザクションで報酬が発生するように）
+    """
+    tester.time_travel(w3.eth.get_block('latest')['timestamp'] + seconds)
+
+
+def measure_isolated(w3: Web3, tester, action) -> int:
+    """
+    スナップショットを取ってactionを実行し、gasを計測した後に状態を元に戻す
+    """
+    snapshot_id = tester.take_snapshot()
+    try:
+        advance_time(w3, tester)
+        return action()
+    finally:
+        tester.revert_to_snapshot(snapshot_id)
+
+
+def measure(w3: Web3, tester, artifacts: dict, label: str, pool, user: str) -> dict:
+    """
+    現在のプール数で各関数のgasを計測する
+    """
+    pool_length = pool.functions.poolLength().call()
+
+    def add():
+        token = deploy_token(w3, artifacts, user, pool_length)
+        return send(w3, pool.functions.add(0, 0, token.address, False, 0), user)
+
+    def add_bulk():
+        tokens = [deploy_token(w3, artifacts, user, pool_length + i).address for i in range(ADD_BULK_SIZE)]
+        return send(w3, pool.functions.addBulk(
+            [0] * ADD_BULK_SIZE, [0] * ADD_BULK_SIZE, tokens, False, 0
+        ), user)
+
+    def harvest():
+        pids = list(range(pool_length))
+        if label == "batch":
+            return send(w3, pool.functions.harvestAll(pids), user)
+        # harvestAllがない場合はプールごとにwithdraw(pid, 0)を送る（合計gas）
+        return sum(send(w3, pool.functions.withdraw(pid, 0), user) for pid in pids)
+
+    def pending():
+        return pool.functions.pendingQUANT(0, user).estimate_gas({'from': user})
+
+    return {
+        "deposit": measure_isolated(w3, tester, lambda: send(w3, pool.functions.deposit(0, DEPOSIT_AMOUNT), user)),
+        "withdraw": measure_isolated(w3, tester, lambda: send(w3, pool.functions.withdraw(0, DEPOSIT_AMOUNT // 2), user)),
+        "add": measure_isolated(w3, tester, add),
+        "addBulk": measure_isolated(w3, tester, add_bulk),
+        "massUpdatePools": measure_isolated(w3, tester, lambda: send(w3, pool.functions.massUpdatePools(), user)),
+        PENDING_LABEL: measure_isolated(w3, tester, pending),
+        "harvest(all pools)": measure_isolated(w3, tester, harvest),
+    }
+
+
+def setup_variant(EthereumTester, PyEVMBackend, artifacts: dict, source: str, name: str):
+    """
+    ローカルEVMにQUANTとプールをデプロイし、コンストラクタで作成されたプールにデポジットする
+
+    Returns:
+        (w3, tester, pool, quant, user)
+    """
+    token_addresses = get_constructor_tokens(source)
+    w3, tester = create_chain(EthereumTester, PyEVMBackend, token_addresses, artifacts["MockERC20"]["bin-runtime"])
+    user = w3.eth.accounts[0]
+
+    # 報酬トークン（QUANT）とプールのデプロイ
+    quant = deploy(w3, artifacts["MockERC20"], user, "Quant", "QUANT")
+    pool_start_time = w3.eth.get_block('latest')['timestamp'] + 3600
+    pool = deploy(w3, artifacts[name], user, quant.address, user, pool_start_time)
+    send(w3, quant.functions.mint(pool.address, 10 ** 30), user)
+    advance_time(w3, tester, 3600 + 1)
+
+    # コンストラクタで作成されたプールにデポジット
+    for pid, address in enumerate(token_addresses):
+        token = w3.eth.contract(address=Web3.to_checksum_address(address), abi=artifacts["MockERC20"]["abi"])
+        stake(w3, pool, token, user, pid)
+    return w3, tester, pool, quant, user
+
+
+def add_pools(w3: Web3, artifacts: dict, pool, user: str, pool_count: int):
+    """
+    目標のプール数までプールを追加してデポジットする
+    """
+    while pool.functions.poolLength().call() < pool_count:
+        pid = pool.functions.poolLength().call()
+        token = deploy_token(w3, artifacts, user, pid)
+        send(w3, pool.functions.add(10 ** 15, 0, token.address, False, 0), user)
+        stake(w3, pool, token, user, pid)
+
+
+def run_variant(EthereumTester, PyEVMBackend, artifacts: dict, label: str, source: str, name: str) -> list:
+    """
+    1つのコントラクトをデプロイし、POOL_COUNTSの各プール数で計測する
+    """
+    w3, tester, pool, _, user = setup_variant(EthereumTester, PyEVMBackend, artifacts, source, name)
+
+    results = []
+    for pool_count in POOL_COUNTS:
+        add_pools(w3, artifacts, pool, user, pool_count)
+        pool_length = pool.functions.poolLength().call()
+        gas = measure(w3, tester, artifacts, label, pool, user)
+        logger.info("%s: プール数 %d の計測完了: %s", label, pool_length, gas)
+        for function_name, gas_used in gas.items():
+            results.append({"variant": label, "pools": pool_length, "function": function_name, "gas": gas_used})
+    return results
+
+
+def payout_state(pool, quant, tokens: list, user: str, pids: list) -> dict:
+    """
+    払い出しの比較に使う状態（QUANT残高、LP残高、userInfo、accQuantPerShare）を読む
+    """
+    return {
+        "QUANT": quant.functions.balanceOf(user).call(),
+        "LP": [token.functions.balanceOf(user).call() for token in tokens],
+        "userInfo": [tuple(pool.functions.userInfo(pid, user).call()) for pid in pids],
+        "accQuantPerShare": [pool.functions.poolInfo(pid).call()[4] for pid in pids],
+    }
+
+
+def check_batch_payouts(EthereumTester, PyEVMBackend, artifacts: dict) -> tuple:
+    """
+    batchバリアントの harvestAll / withdrawMany が、同じタイムスタンプで withdraw を
+    プールごとに送った場合と同じ払い出し・状態になるか確認する
+
+    ・eth-testerは1ブロックに複数のトランザクションを入れると互いの状態変更が反映されないため、
+      withdrawはプールごとにスナップショットから同じタイムスタンプで1件ずつ実行し、結果を合算する
+    ・開始済みのプール同士は状態を共有しない（報酬はプールごとに計算される）ため、
+      合算した結果は同じブロックでN件送った場合と一致する
+
+    Returns:
+        (mismatches, checked): 不一致の内容のリスト（空なら全て一致）と、一致した比較の説明のリスト
+    """
+    _, source, name = next(variant for variant in VARIANTS if variant[0] == "batch")
+    w3, tester, pool, quant, user = setup_variant(EthereumTester, PyEVMBackend, artifacts, source, name)
+    add_pools(w3, artifacts, pool, user, PAYOUT_CHECK_POOLS)
+    pids = list(range(pool.functions.poolLength().call()))
+    token_abi = artifacts["MockERC20"]["abi"]
+    tokens = [w3.eth.contract(address=pool.functions.poolInfo(pid).call()[0], abi=token_abi) for pid in pids]
+    amounts = [DEPOSIT_AMOUNT // 3] * len(pids)
+
+    before = payout_state(pool, quant, tokens, user, pids)
+    # 全ての実行で同じブロックタイムスタンプを使う
+    timestamp = w3.eth.get_block('latest')['timestamp'] + TIME_STEP_SECOND
+
+    def run(call):
+        # スナップショットから指定のタイムスタンプで1件だけ実行し、実行後の状態を返す（失敗した場合はNone）
+        snapshot_id = tester.take_snapshot()
+        try:
+            tester.time_travel(timestamp)
+            tx_hash = call.transact({'from': user})
+            if w3.eth.wait_for_transaction_receipt(tx_hash)['status'] != 1:
+                return None
+            return payout_state(pool, quant, tokens, user, pids)
+        except Exception as e:
+            logger.error("実行に失敗しました: %s", e)
+            return None
+        finally:
+            tester.revert_to_snapshot(snapshot_id)
+
+    def run_each(withdraw_amounts):
+        # プールごとのwithdrawの結果を合算し、N件送った場合の状態にする
+        expected = {field: list(value) if isinstance(value, list) else value for field, value in before.items()}
+        for i, (pid, amount) in enumerate(zip(pids, withdraw_amounts)):
+            state = run(pool.functions.withdraw(pid, amount))
+            if state is None:
+                return None
+            expected["QUANT"] += state["QUANT"] - before["QUANT"]
+            for field in ("LP", "userInfo", "accQuantPerShare"):
+                expected[field][i] = state[field][i]
+        return expected
+
+    # (比較の基準, withdrawの量, 比較対象)
+    cases = [
+        ("withdraw(pid, 0) x N", [0] * len(pids), [
+            ("harvestAll(pids)", pool.functions.harvestAll(pids)),
+            ("withdrawMany(pids, 0)", pool.functions.withdrawMany(pids, [0] * len(pids))),
+        ]),
+        ("withdraw(pid, amount) x N", amounts, [
+            ("withdrawMany(pids, amounts)", pool.functions.withdrawMany(pids, amounts)),
+        ]),
+    ]
+
+    mismatches = []
+    checked = []
+    for base_label, withdraw_amounts, targets in cases:
+        expected = run_each(withdraw_amounts)
+        if expected is None:
+            mismatches.append(f"{base_label} が失敗しました")
+            continue
+        if expected["QUANT"] <= before["QUANT"]:
+            mismatches.append(f"{base_label} で報酬が払い出されていません（比較になりません）")
+            continue
+        logger.info("%s: 報酬 %d", base_label, expected["QUANT"] - before["QUANT"])
+        for label, call in targets:
+            actual = run(call)
+            if actual is None:
+                mismatches.append(f"{label} が失敗しました")
+                continue
+            for field, value in expected.items():
+                if actual[field] != value:
+                    mismatches.append(f"{label} の {field} が {base_label} と一致しません: {actual[field]} != {value}")
+            if actual == expected:
+                checked.append(f"{label} = {base_label}（報酬 {expected['QUANT'] - before['QUANT']}）")
+    return mismatches, checked
+
+
+def write_report(results: list, csv_path: str, markdown_path: str, payout_checks: list = None):
+    """
+    計測結果をCSVに保存し、バリアント比較の表を表示してMarkdownにも保存する
+    （payout_checksを指定した場合は、払い出しの確認結果もMarkdownの先頭に書く）
+    """
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["variant", "pools", "function", "gas"])
+        writer.writeheader()
+        writer.writerows(results)
+    logger.info("レポートを保存しました: %s", csv_path)
+
+    labels = [label for label, _, _ in VARIANTS]
+    table = {}
+    for row in results:
+        table.setdefault((row["function"], row["pools"]), {})[row["variant"]] = row["gas"]
+
+    lines = []
+    if payout_checks:
+        lines.append(f"払い出しの確認（batch、プール数 {PAYOUT_CHECK_POOLS}、QUANT・LP残高・userInfo・accQuantPerShareが一致）:")
+        lines += [f"- {check}" for check in payout_checks] + [""]
+    lines += ["| function | pools | " + " | ".join(labels) + " | diff |", "|---" * (len(labels) + 3) + "|"]
+    for (function_name, pool_count), gas in table.items():
+        values = [gas.get(label) for label in labels]
+        diff = ""
+        if values[0] and values[-1] is not None:
+            diff = f"{(values[-1] - values[0]) / values[0] * 100:+.1f}%"
+        cells = " | ".join("-" if v is None else f"{v:,}" for v in values)
+        lines.append(f"| {function_name} | {pool_count} | {cells} | {diff} |")
+    lines += ["", f"※ {PENDING_LABEL} はestimate_gasの値（21000の基本gasを含む）。他の行はgasUsed。"]
+    print("\n".join(lines))
+    with open(markdown_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    logger.info("レポートを保存しました: %s", markdown_path)
+
+
+def main():
+    solcx, EthereumTester, PyEVMBackend = load_dependencies()
+    artifacts = compile_contracts(solcx)
+
+    # 計測の前に、batchバリアントの払い出しがwithdrawと同じか確認する
+    mismatches, payout_checks = check_batch_payouts(EthereumTester, PyEVMBackend, artifacts)
+    if mismatches:
+        for mismatch in mismatches:
+            logger.error(mismatch)
+        exit(1)
+    logger.info("harvestAll / withdrawMany の払い出しは withdraw と一致しました（プール数 %d）", PAYOUT_CHECK_POOLS)
+
+    results = []
+    for label, source, name in VARIANTS:
+        results.extend(run_variant(EthereumTester, PyEVMBackend, artifacts, label, source, name))
+    write_report(results, REPORT_CSV, REPORT_MARKDOWN, payout_checks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import json
+import logging
+from eth_abi import encode, decode
+from web3 import Web3
+from receipt_decoder import to_bytes
+
+logger = logging.getLogger(__name__)
+
+MAX_UINT256 = 2 ** 256 - 1
+
+# 関数セレクタとイベントトピックは事前に計算しておく
+APPROVE_SELECTOR = Web3.keccak(text="approve(address,uint256)")[:4]
+ALLOWANCE_SELECTOR = Web3.keccak(text="allowance(address,address)")[:4]
+APPROVAL_TOPIC = Web3.to_hex(Web3.keccak(text="Approval(address,address,uint256)"))
+
+
+def encode_approve_data(spender: str, amount: int) -> str:
+    """approve(spender, amount) のcalldataを直接エンコードする（build_transactionを使わない）"""
+    return Web3.to_hex(APPROVE_SELECTOR + encode(["address", "uint256"], [spender, amount]))
+
+
+def address_topic(address: str) -> str:
+    """アドレスをindexedイベント引数のトピック（32byte）形式にする"""
+    return "0x" + "0" * 24 + address[2:].lower()
+
+
+class AllowanceManager:
+    """
+    (owner, token, spender) ごとのallowanceをキャッシュし、approveを最小限にするクラス
+
+    ・allowanceはRPCで1回読んだ後はキャッシュし、スワップ送信ごとにローカルで減算する
+    ・Approvalイベント（owner宛）を検知したら該当エントリを破棄し、次回RPCで読み直す
+    ・approveする量はポリシーで決める（"max"ならuint256最大値で、以降のapproveが不要になる）
+    ・cache_pathを指定すると、キャッシュと同期済みブロックをJSONに保存して実行をまたいで使う
+
+    使い方:
+        manager = AllowanceManager(w3, wallet_address)
+        if manager.needs_approval(token_address, router_address, amount):
+            tx = manager.build_approve_tx(token_address, router_address, amount, {...})
+            ...署名・送信...
+            manager.record_approval(token_address, router_address, manager.approval_amount(amount))
+        ...スワップ送信...
+        manager.consume(token_address, router_address, amount)
+    """
+
+    def __init__(self, w3: Web3, owner: str, approval_policy: str = "max", approval_multiple: int = 10,
+                 cache_path: str = None, log_chunk_size: int = 2000, max_sync_blocks: int = 20000):
+        """
+        Args:
+            w3 (Web3): Web3インスタンス
+            owner (str): allowanceのowner（ウォレットアドレス）
+            approval_policy (str): "max"ならMAX_UINT256、"multiple"なら必要量のapproval_multiple倍をapproveする
+            approval_multiple (int): "multiple"ポリシーの倍率
+            cache_path (str): キャッシュを保存するJSONファイル（Noneなら保存しない）
+            log_chunk_size (int): sync()で1回のget_logsに指定するブロック数
+            max_sync_blocks (int): sync()でログを追うブロック数の上限（超えたらキャッシュを破棄する）
+        """
+        if approval_policy not in ("max", "multiple"):
+            raise ValueError(f"不明なapproval_policyです: {approval_policy}")
+        self._w3 = w3
+        self.owner = Web3.to_checksum_address(owner)
+        self.approval_policy = approval_policy
+        self.approval_multiple = approval_multiple
+        self.cache_path = cache_path
+        self.log_chunk_size = log_chunk_size
+        self.max_sync_blocks = max_sync_blocks
+        self._allowances = {}  # (token, spender) -> allowance（raw値）
+        self._synced_block = None  # Approvalイベントを確認済みのブロック
+        self._load()
+
+    def get(self, token: str, spender: str) -> int:
+        """
+        allowanceを返す（キャッシュになければRPCで読んでキャッシュする）
+        """
+        key = self._key(token, spender)
+        if key not in self._allowances:
+            self._allowances[key] = self._fetch(*key)
+            self._save()
+        return self._allowances[key]
+
+    def needs_approval(self, token: str, spender: str, amount: int) -> bool:
+        """
+        amount分のallowanceが足りなければTrueを返す
+        キャッシュ上で足りない場合のみRPCで読み直して確認する
+        """
+        key = self._key(token, spender)
+        if self._allowances.get(key, -1) >= amount:
+            return False
+        self.invalidate(token, spender)
+        return self.get(token, spender) < amount
+
+    def approval_amount(self, required: int) -> int:
+        """ポリシーに従ってapproveする量を返す"""
+        if self.approval_policy == "max":
+            return MAX_UINT256
+        return min(required * self.approval_multiple, MAX_UINT256)
+
+    def build_approve_tx(self, token: str, spender: str, required: int, tx_params: dict, gas_margin: float = 1.2) -> dict:
+        """
+        approveトランザクションを構築する（calldataは直接エンコードし、gasはestimate_gasにマージンを掛ける）
+
+        Args:
+            token (str): トークンアドレス
+            spender (str): 承認先アドレス
+            required (int): 必要なallowance（実際の承認量はポリシーで決まる）
+            tx_params (dict): nonce, chainId, ガス価格などの追加パラメータ
+        """
+        tx = {
+            'from': self.owner,
+            'to': Web3.to_checksum_address(token),
+            'value': 0,
+            'data': encode_approve_data(Web3.to_checksum_address(spender), self.approval_amount(required)),
+            **tx_params,
+        }
+        if 'gas' not in tx:
+            tx['gas'] = int(self._w3.eth.estimate_gas(tx) * gas_margin)
+        return tx
+
+    def record_approval(self, token: str, spender: str, amount: int):
+        """approveを送信した後、承認量をキャッシュに反映する"""
+        self._allowances[self._key(token, spender)] = amount
+        self._save()
+
+    def consume(self, token: str, spender: str, amount: int):
+        """
+        spenderがamountを使う（スワップを送信した）分をローカルで減算する
+        MAX_UINT256の承認は減らないトークンが多いため、その場合はそのままにする
+        """
+        key = self._key(token, spender)
+        current = self._allowances.get(key)
+        if current is None or current == MAX_UINT256:
+            return
+        self._allowances[key] = max(current - amount, 0)
+        self._save()
+
+    def invalidate(self, token: str = None, spender: str = None):
+        """キャッシュを破棄する（token/spenderを省略した場合は該当する全て）"""
+        token = None if token is None else Web3.to_checksum_address(token)
+        spender = None if spender is None else Web3.to_checksum_address(spender)
+        for key in list(self._allowances):
+            if (token is None or key[0] == token) and (spender is None or key[1] == spender):
+                del self._allowances[key]
+        self._save()
+
+    def process_logs(self, logs):
+        """
+        ログ（receipt['logs'] や get_logs の結果）からowner宛のApprovalイベントを探し、該当エントリを破棄する
+        """
+        owner_topic = address_topic(self.owner)
+        for log in logs:
+            # topicはHexBytesとhex文字列のどちらもあり得るため、bytesにそろえてから変換する
+            topics = [Web3.to_hex(to_bytes(topic)) for topic in log['topics']]
+            if len(topics) < 3 or topics[0] != APPROVAL_TOPIC or topics[1] != owner_topic:
+                continue
+            spender = Web3.to_checksum_address("0x" + topics[2][-40:])
+            logger.info("Approvalイベントを検知: token: %s, spender: %s", log['address'], spender)
+            self.invalidate(log['address'], spender)
+
+    def sync(self, to_block: int = None):
+        """
+        前回同期したブロック以降のowner宛Approvalイベントをget_logsで取得し、キャッシュに反映する
+        初回（同期済みブロックがない場合）はキャッシュが空なので取得せず、現在のブロックを記録するだけ
+        ・範囲はlog_chunk_sizeブロックずつに分けて取得する（RPCの範囲制限対策）
+        ・間がmax_sync_blocksより空いている場合や、get_logsが失敗した場合は
+          ログを追わずにキャッシュを全て破棄する（次回get()でRPCから読み直す）
+        """
+        if to_block is None:
+            to_block = self._w3.eth.block_number
+        if self._synced_block is not None and self._allowances and to_block > self._synced_block:
+            if to_block - self._synced_block > self.max_sync_blocks:
+                logger.info("前回の同期から %s ブロック経過したため、allowanceのキャッシュを破棄します",
+                            to_block - self._synced_block)
+                self.invalidate()
+            else:
+                try:
+                    for from_block in range(self._synced_block + 1, to_block + 1, self.log_chunk_size):
+                        logs = self._w3.eth.get_logs({
+                            'fromBlock': from_block,
+                            'toBlock': min(from_block + self.log_chunk_size - 1, to_block),
+                            'topics': [APPROVAL_TOPIC, address_topic(self.owner)],
+                        })
+                        self.process_logs(logs)
+                except Exception as e:
+                    logger.warning("Approvalイベントの取得に失敗したため、allowanceのキャッシュを破棄します: %s", e)
+                    self.invalidate()
+        self._synced_block = max(to_block, self._synced_block or 0)
+        self._save()
+
+    def _key(self, token: str, spender: str) -> tuple:
+        return Web3.to_checksum_address(token), Web3.to_checksum_address(spender)
+
+    def _fetch(self, token: str, spender: str) -> int:
+        data = ALLOWANCE_SELECTOR + encode(["address", "address"], [self.owner, spender])
+        result = self._w3.eth.call({'to': token, 'data': Web3.to_hex(data)})
+        return decode(["uint256"], result)[0]
+
+    def _load(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return
+        with open(self.cache_path) as f:
+            data = json.load(f)
+        if data.get("owner") != self.owner:
+            return
+        self._synced_block = data.get("synced_block")
+        for key, value in data.get("allowances", {}).items():
+            token, spender = key.split(":")
+            self._allowances[(token, spender)] = int(value)
+
+    def _save(self):
+        if self.cache_path is None:
+            return
+        data = {
+            "owner": self.owner,
+            "synced_block": self._synced_block,
+            # uint256はJSONの数値精度を超えるため文字列で保存する
+            "allowances": {f"{token}:{spender}": str(value) for (token, spender), value in self._allowances.items()},
+        }
+        with open(self.cache_path, "w") as f:
+            json.dump(data, f)
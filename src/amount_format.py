@@ -0,0 +1,187 @@
+import re
+from decimal import Decimal
+from snapshot_store import sum_uint256_limbs
+
+try:
+    import numpy as np  # あれば uint64配列の合計をベクトル化する
+except ImportError:
+    np = None
+
+# ========================================
+# raw値（uint256の整数）とトークン単位の変換・表示をまとめて行う
+# ・floatは使わず、整数と文字列の操作だけで変換するため桁落ちしない
+# ・大量の値は decimals ごとにまとめて str() → 文字列スライスで変換する
+#   （1件ずつDecimalを作るより速く、uint256はnumpyの固定長整数に収まらないためPythonのintで扱う）
+# ・合計は、値がnumpyのuint64配列（SnapshotStoreと同じ64bit x 4のlimbも可）ならlimbごとにベクトル化する
+#   （Pythonのintのリストをlimbに分割すると、そのままintで足すより遅いため、その場合はintのまま合計する）
+# ========================================
+
+# format_compactの単位（しきい値の桁数, 接尾辞）
+COMPACT_UNITS = [(9, "b"), (6, "m"), (3, "k")]
+
+# parse_unitsが受け付ける形式（符号, 整数部, 小数部）
+AMOUNT_PATTERN = re.compile(r"([+-]?)([0-9]*)(?:\.([0-9]*))?")
+
+
+def _as_list(values) -> list:
+    # numpyの配列などはtolist()でまとめてPythonのintにする
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+def _uint64_limbs(raws):
+    # numpyのuint64配列ならlimbのリスト（下位から）を返す。1次元はそのまま、(n, 4) はsplit_uint256の順
+    if np is None or not isinstance(raws, np.ndarray) or raws.dtype != np.uint64:
+        return None
+    if raws.ndim == 1:
+        return [raws]
+    if raws.ndim == 2 and raws.shape[1] == 4:
+        return [raws[:, i] for i in range(4)]
+    return None
+
+
+def _format_group(raws: list, decimals: int, precision: int = None) -> list:
+    # 同じdecimalsの値をまとめて変換する（precisionを指定した場合は小数点以下を切り捨て）
+    if decimals == 0:
+        return [str(raw) for raw in raws]
+    width = decimals + 1
+    keep = decimals if precision is None else min(precision, decimals)
+    formatted = []
+    for raw in raws:
+        sign = "-" if raw < 0 else ""
+        digits = str(-raw if sign else raw).rjust(width, "0")
+        fraction = digits[-decimals:][:keep].rstrip("0")
+        whole = digits[:-decimals]
+        formatted.append(f"{sign}{whole}.{fraction}" if fraction else f"{sign}{whole}")
+    return formatted
+
+
+def format_units(raw: int, decimals: int, precision: int = None) -> str:
+    """
+    raw値をトークン単位の文字列にする（例: format_units(1500000, 6) → "1.5"）
+
+    Args:
+        raw (int): raw値
+        decimals (int): トークンのdecimals
+        precision (int): 小数点以下の最大桁数（超える分は切り捨て。Noneなら全桁）
+    """
+    return _format_group([raw], decimals, precision)[0]
+
+
+def format_units_many(raws, decimals, precision: int = None) -> list:
+    """
+    複数のraw値をまとめてトークン単位の文字列にする
+
+    Args:
+        raws: raw値のiterable（numpyの配列も可）
+        decimals: 全ての値に共通のdecimals(int)、または値ごとのdecimalsのiterable
+        precision (int): 小数点以下の最大桁数（Noneなら全桁）
+
+    Returns:
+        list: rawsと同じ順の文字列のリスト
+    """
+    raws = _as_list(raws)
+    if isinstance(decimals, int):
+        return _format_group(raws, decimals, precision)
+    decimals = _as_list(decimals)
+    if len(decimals) != len(raws):
+        raise ValueError(f"rawsとdecimalsの数が違います: {len(raws)} != {len(decimals)}")
+    # decimalsごとにまとめて変換し、元の順番に戻す
+    groups = {}
+    for i, d in enumerate(decimals):
+        groups.setdefault(d, []).append(i)
+    formatted = [None] * len(raws)
+    for d, index in groups.items():
+        for i, text in zip(index, _format_group([raws[i] for i in index], d, precision)):
+            formatted[i] = text
+    return formatted
+
+
+def format_compact(raw: int, decimals: int) -> str:
+    """
+    raw値を略記にする（例: 1234567 トークン → "1.2m"。小数点以下1桁、切り捨て）
+    しきい値の判定も整数で行う
+    """
+    sign = "-" if raw < 0 else ""
+    raw = abs(raw)
+    for digits, suffix in COMPACT_UNITS:
+        if raw >= 10 ** (decimals + digits):
+            tenths = raw // 10 ** (decimals + digits - 1)
+            return f"{sign}{tenths // 10}.{tenths % 10}{suffix}"
+    return sign + format_units(raw, decimals)
+
+
+def parse_units(amount, decimals: int) -> int:
+    """
+    トークン単位の量をraw値にする（例: parse_units("1.5", 6) → 1500000）
+    floatは誤差を含むため、文字列・int・Decimalで渡すこと
+    """
+    if isinstance(amount, float):
+        raise TypeError("floatは使えません。文字列かDecimalで指定してください")
+    # Decimalの演算は精度(既定28桁)で丸められるため、文字列のまま整数に変換する
+    text = format(amount, "f") if isinstance(amount, Decimal) else str(amount).strip()
+    match = AMOUNT_PATTERN.fullmatch(text)
+    if match is None:
+        raise ValueError(f"数値として解釈できません: {amount}")
+    sign, whole, fraction = match.group(1), match.group(2), (match.group(3) or "").rstrip("0")
+    if not whole and not match.group(3):
+        raise ValueError(f"数値として解釈できません: {amount}")
+    # 末尾の0を除いても桁が多い場合は、raw値にすると切り捨てが起きるためエラーにする
+    if len(fraction) > decimals:
+        raise ValueError(f"decimals({decimals})より細かい値です: {amount}")
+    raw = int(whole or "0") * 10 ** decimals + int(fraction.ljust(decimals, "0") or "0")
+    return -raw if sign == "-" else raw
+
+
+def sum_by_token(raws, tokens) -> dict:
+    """
+    raw値をトークンごとに合計する（整数なので誤差なし）
+
+    Args:
+        raws: raw値のiterable（numpyのuint64配列、または (n, 4) のlimb配列ならベクトル化して合計する）
+        tokens: 各値のトークンアドレスのiterable
+
+    Returns:
+        dict: {token: 合計raw値}
+    """
+    limbs = _uint64_limbs(raws)
+    if limbs is not None:
+        # トークンだけ番号に変換し、値はSnapshotStoreと同じくlimbごとにまとめて合計する
+        index = {}
+        groups = np.fromiter((index.setdefault(token, len(index)) for token in _as_list(tokens)),
+                             dtype=np.intp, count=len(limbs[0]))
+        return dict(zip(index, sum_uint256_limbs(limbs, groups, len(index))))
+    totals = {}
+    for token, raw in zip(_as_list(tokens), _as_list(raws)):
+        totals[token] = totals.get(token, 0) + raw
+    return totals
+
+
+def summarize(raws, tokens, decimals_by_token: dict, precision: int = None) -> dict:
+    """
+    残高などをトークンごとに集計し、表示用の文字列もまとめて作る
+
+    Args:
+        raws: raw値のiterable（sum_by_tokenと同じくnumpyのuint64配列も可）
+        tokens: 各値のトークンアドレスのiterable
+        decimals_by_token (dict): {token: decimals}
+        precision (int): 小数点以下の最大桁数（Noneなら全桁）
+
+    Returns:
+        dict: {token: {"count", "total"(raw値), "formatted", "compact"}}
+    """
+    tokens = _as_list(tokens)
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    totals = sum_by_token(raws, tokens)
+    return {
+        token: {
+            "count": counts[token],
+            "total": total,
+            "formatted": format_units(total, decimals_by_token[token], precision),
+            "compact": format_compact(total, decimals_by_token[token]),
+        }
+        for token, total in totals.items()
+    }
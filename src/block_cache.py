@@ -0,0 +1,180 @@
+import logging
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+
+def to_hash_hex(value) -> str:
+    """ブロックハッシュ（HexBytes / bytes / hex文字列）を0x付きの小文字hex文字列にそろえる"""
+    if isinstance(value, str):
+        return Web3.to_hex(hexstr=value).lower()
+    return Web3.to_hex(value)
+
+
+class BlockStateCache:
+    """
+    ブロックハッシュ単位で状態（残高・リザーブ・プール情報など）をキャッシュするクラス
+
+    ・値は「どのブロックで読んだか」（ブロックハッシュ）に紐づけて保存する
+    ・親ハッシュを記録し、reorgを検知した場合は巻き戻されたブロックのエントリだけを破棄する
+    ・先頭ブロックから max_depth 以上深いブロックは古い順に破棄してメモリを一定に保つ
+
+    使い方:
+        cache = BlockStateCache(w3)
+        head = cache.update_head()
+        balance = cache.get_or_fetch(
+            ("balanceOf", token.address, wallet),
+            lambda block_hash: token.functions.balanceOf(wallet).call(block_identifier=block_hash),
+        )
+    """
+
+    def __init__(self, w3: Web3 = None, max_depth: int = 64):
+        """
+        Args:
+            w3 (Web3): reorg時に共通祖先まで遡るためのWeb3インスタンス（Noneの場合は遡らずに全破棄）
+            max_depth (int): 保持するブロックの深さ
+        """
+        self._w3 = w3
+        self.max_depth = max_depth
+        self._blocks = {}     # block_hash -> (number, parent_hash)
+        self._canonical = {}  # number -> block_hash（現在の正規チェーン）
+        self._entries = {}    # block_hash -> {key: value}
+        self._head = None
+
+    @property
+    def head(self) -> str:
+        """現在の先頭ブロックのハッシュ"""
+        return self._head
+
+    @property
+    def head_number(self) -> int:
+        """現在の先頭ブロックの番号"""
+        if self._head is None:
+            return None
+        return self._blocks[self._head][0]
+
+    def update_head(self, block_identifier='latest'):
+        """
+        最新ブロックを取得してキャッシュのチェーンを更新し、取得したブロックを返す
+        """
+        block = self._w3.eth.get_block(block_identifier)
+        self.add_block(block)
+        return block
+
+    def add_block(self, block) -> list:
+        """
+        新しいブロック（hash, parentHash, numberを持つdict）を追加する
+
+        Returns:
+            orphaned (list): reorgで巻き戻されたブロックハッシュのリスト
+        """
+        # 共通祖先まで遡る場合も、破棄とログは最後に1回だけ行う
+        orphaned = self._add_block(block)
+        for orphaned_hash in orphaned:
+            self._drop(orphaned_hash)
+        if orphaned:
+            logger.warning("reorgを検知しました: ブロック %d で %d ブロックを破棄", block['number'], len(orphaned))
+        return orphaned
+
+    def _add_block(self, block) -> list:
+        # ブロックを正規チェーンに追加し、巻き戻されたブロックハッシュを返す（破棄はadd_blockで行う）
+        block_hash = to_hash_hex(block['hash'])
+        parent_hash = to_hash_hex(block['parentHash'])
+        number = block['number']
+
+        if self._canonical.get(number) == block_hash:
+            return []
+
+        # 新しいブロック以降の高さにある正規チェーンのブロックは巻き戻す
+        orphaned = [self._canonical.pop(n) for n in sorted(self._canonical) if n >= number]
+
+        if self._canonical:
+            top = max(self._canonical)
+            if number - self.max_depth >= top:
+                # 間が max_depth 以上空いた場合、残りは全てevict対象なので確認せずに破棄する
+                for n in sorted(self._canonical):
+                    self._drop(self._canonical.pop(n))
+            elif top == number - 1:
+                # 先頭の直後のブロック: 親が一致しなければ共通祖先まで遡る
+                if self._canonical[top] != parent_hash:
+                    orphaned.extend(self._rewind(parent_hash))
+            elif self._w3 is not None:
+                # 間が空いた場合: キャッシュの最も高いブロックを番号で1回だけ取り直し、
+                # ハッシュが一致すればそれ以前のブロックも全て正規チェーンのまま
+                current = self._w3.eth.get_block(top)
+                if to_hash_hex(current['hash']) != self._canonical[top]:
+                    orphaned.extend(self._add_block(current))
+            # w3がない場合、間が空いたブロックは祖先を確認できないため、キャッシュはそのまま残す
+
+        self._blocks[block_hash] = (number, parent_hash)
+        self._canonical[number] = block_hash
+        self._entries.setdefault(block_hash, {})
+        self._head = block_hash
+        self._evict()
+        return orphaned
+
+    def get(self, key, block_hash: str = None, default=None):
+        """
+        指定ブロック（省略時は先頭ブロック）でキャッシュされた値を返す
+        """
+        block_hash = self._head if block_hash is None else to_hash_hex(block_hash)
+        return self._entries.get(block_hash, {}).get(key, default)
+
+    def set(self, key, value, block_hash: str = None) -> bool:
+        """
+        指定ブロック（省略時は先頭ブロック）の値としてキャッシュする
+        ※ 未登録のブロックはreorgを追跡できないためキャッシュしない
+
+        Returns:
+            bool: キャッシュした場合True
+        """
+        block_hash = self._head if block_hash is None else to_hash_hex(block_hash)
+        if block_hash not in self._entries:
+            return False
+        self._entries[block_hash][key] = value
+        return True
+
+    def get_or_fetch(self, key, fetch, block_hash: str = None):
+        """
+        キャッシュにあればその値を返し、なければ fetch(block_hash) で取得してキャッシュする
+        fetchはblock_identifierにblock_hashを指定して読み出すこと（同一ブロックの値であることを保証するため）
+        """
+        block_hash = self._head if block_hash is None else to_hash_hex(block_hash)
+        entries = self._entries.get(block_hash)
+        if entries is not None and key in entries:
+            return entries[key]
+        value = fetch(block_hash)
+        self.set(key, value, block_hash)
+        return value
+
+    def invalidate(self, block_hash: str = None, key=None):
+        """
+        指定ブロックのエントリ（keyを指定した場合はそのキーのみ）を破棄する
+        """
+        block_hash = self._head if block_hash is None else to_hash_hex(block_hash)
+        entries = self._entries.get(block_hash)
+        if entries is None:
+            return
+        if key is None:
+            entries.clear()
+        else:
+            entries.pop(key, None)
+
+    def _rewind(self, parent_hash: str) -> list:
+        # 親ブロックを正規チェーンとして追加し直す（一致するブロックまで1ブロックずつ遡る）
+        if self._w3 is not None:
+            return self._add_block(self._w3.eth.get_block(parent_hash))
+        # 祖先を確認できないため、残っているブロックも全て破棄する
+        return [self._canonical.pop(n) for n in sorted(self._canonical)]
+
+    def _drop(self, block_hash: str):
+        self._blocks.pop(block_hash, None)
+        self._entries.pop(block_hash, None)
+
+    def _evict(self):
+        # 先頭から max_depth 以上深いブロックを古い順に破棄する
+        min_number = self.head_number - self.max_depth
+        for n in sorted(self._canonical):
+            if n > min_number:
+                break
+            self._drop(self._canonical.pop(n))
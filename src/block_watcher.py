@@ -0,0 +1,255 @@
+import time
+import logging
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from block_cache import BlockStateCache, to_hash_hex
+from receipt_decoder import decode_log
+
+logger = logging.getLogger(__name__)
+
+ZERO_ADDRESS = "0x" + "0" * 40
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+APPROVAL_TOPIC = Web3.to_hex(Web3.keccak(text="Approval(address,address,uint256)"))
+
+ERC20_ABI = [
+    {
+        "inputs": [{"name": "account", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"name": "", "type": "uint8"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "totalSupply",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "owner", "type": "address"}, {"name": "spender", "type": "address"}],
+        "name": "allowance",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+]
+
+
+class BlockWatcher:
+    """
+    ウォレット・トークン・トランザクションの値を監視し、新しいブロックで変化した値だけを返すクラス
+
+    ・最初に全ての値を1回だけ読む
+    ・以降はpoll()ごとに、前回から増えたブロック範囲の監視トークンのTransfer/Approvalログを
+      1回のget_logsで取得し、触られたアドレスに関係する値だけを最新ブロック時点で読み直す
+    ・nonceとネイティブ残高はログに出ないため、track_native=Trueの場合のみ
+      新しいブロックの本体を取得し、ウォレットが送受信したトランザクションを探す
+    ・値の読み出しは全て最新ブロックのハッシュに固定する（途中でreorgが起きても別のフォークの値が混ざらない）
+    ・コントラクト経由のネイティブ送金（内部トランザクション）はトランザクションにも出ないため、
+      full_refresh_blocks ごと、またはreorg検知時に全ての値を読み直す
+
+    値のキー:
+        ("base_fee",), ("nonce", wallet), ("balance", wallet), ("total_supply", token),
+        ("token_balance", token, wallet), ("allowance", token, wallet, spender), ("tx_status", tx_hash)
+    """
+
+    def __init__(self, w3: Web3, wallets: list, tokens: list, spenders: list = None, tx_hashes: list = None,
+                 full_refresh_blocks: int = 100, track_native: bool = True):
+        """
+        Args:
+            full_refresh_blocks (int): 全ての値を読み直す間隔（ブロック数）。前回から間が空いた場合もこれで判定する
+            track_native (bool): Falseならブロック本体を取得せず、nonceとネイティブ残高は全体の読み直しでのみ更新する
+        """
+        self._w3 = w3
+        self.wallets = {wallet.lower(): Web3.to_checksum_address(wallet) for wallet in wallets}
+        self.tokens = {token.lower(): w3.eth.contract(address=Web3.to_checksum_address(token), abi=ERC20_ABI)
+                       for token in tokens}
+        self.spenders = {spender.lower(): Web3.to_checksum_address(spender) for spender in (spenders or [])}
+        self.tx_hashes = [Web3.to_hex(hexstr=tx_hash).lower() for tx_hash in (tx_hashes or [])]
+        self.full_refresh_blocks = full_refresh_blocks
+        self.track_native = track_native
+        self.values = {}
+        self.transactions = {}  # 監視するトランザクションの詳細（最初に1回だけ取得）
+        self._chain = BlockStateCache(w3, max_depth=full_refresh_blocks)
+        self._last_block = None
+        self._last_full_refresh = None
+
+    def all_keys(self) -> list:
+        keys = [("base_fee",)]
+        for wallet in self.wallets:
+            keys += [("nonce", wallet), ("balance", wallet)]
+        for token in self.tokens:
+            keys.append(("total_supply", token))
+            for wallet in self.wallets:
+                keys.append(("token_balance", token, wallet))
+                keys += [("allowance", token, wallet, spender) for spender in self.spenders]
+        return keys + self._pending_tx_keys()
+
+    def start(self) -> dict:
+        """
+        最新ブロック時点の全ての値を読み、{key: value} を返す
+        """
+        block = self._w3.eth.get_block('latest')
+        self._chain.add_block(block)
+        for tx_hash in self.tx_hashes:
+            try:
+                self.transactions[tx_hash] = self._w3.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                self.transactions[tx_hash] = None
+        self._refresh(self.all_keys(), block)
+        self._last_block = block['number']
+        self._last_full_refresh = block['number']
+        return dict(self.values)
+
+    def poll(self) -> list:
+        """
+        前回以降の新しいブロックをまとめて処理し、変化した値のリスト [(block_number, key, old, new), ...] を返す
+        （block_numberは値を読んだ最新ブロック）
+        """
+        latest = self._w3.eth.block_number
+        if latest <= self._last_block:
+            return []
+        full = latest - self._last_block > self.full_refresh_blocks \
+            or latest - self._last_full_refresh >= self.full_refresh_blocks
+        blocks = self._new_blocks(latest, with_transactions=self.track_native and bool(self.wallets) and not full)
+        head = blocks[-1]
+
+        # 古い順に追加する（前回の先頭に直接つながるため、reorgの確認に追加のRPCは不要）
+        orphaned = []
+        for block in blocks:
+            orphaned += self._chain.add_block(block)
+        if orphaned:
+            logger.info("reorgを検知したため全ての値を読み直します: ブロック %s", head['number'])
+        keys = None if orphaned or full else self._touched_keys(blocks)
+        if keys is None:
+            keys = self.all_keys()
+            self._last_full_refresh = head['number']
+        self._last_block = head['number']
+        return [(head['number'], key, old, new) for key, old, new in self._refresh(keys, head)]
+
+    def run(self, interval_second: float, on_diff):
+        """
+        interval_second ごとにpoll()し、変化があればon_diff(diffs)を呼ぶ（終了しない）
+        """
+        while True:
+            diffs = self.poll()
+            if diffs:
+                on_diff(diffs)
+            time.sleep(interval_second)
+
+    def _new_blocks(self, latest: int, with_transactions: bool) -> list:
+        # 前回の次のブロックから最新ブロックまでを古い順に返す
+        # ブロック本体が不要な場合は最新ブロックのヘッダーだけを取得する
+        head = self._w3.eth.get_block(latest, full_transactions=with_transactions)
+        if not with_transactions:
+            return [head]
+        # 同じフォークのブロックをそろえるため、番号ではなく親ハッシュで遡る
+        blocks = [head]
+        while blocks[-1]['number'] > self._last_block + 1:
+            blocks.append(self._w3.eth.get_block(blocks[-1]['parentHash'], full_transactions=True))
+        return blocks[::-1]
+
+    def _pending_tx_keys(self) -> list:
+        # 取り込まれたトランザクションのレシートは変わらないため、未確定のものだけ読む
+        return [("tx_status", tx_hash) for tx_hash in self.tx_hashes if self.values.get(("tx_status", tx_hash)) is None]
+
+    def _touched_keys(self, blocks: list):
+        # 新しいブロックのトランザクションとログから、変化した可能性のある値のキーを集める
+        # get_logsが取得済みのブロックと別のフォークのログを返した場合はNone（全て読み直す）
+        keys = {("base_fee",)}
+        if self.track_native and self.wallets:
+            pending = set(self._pending_tx_keys())
+            for block in blocks:
+                for tx in block['transactions']:
+                    sender = tx['from'].lower()
+                    receiver = (tx['to'] or "").lower()
+                    if sender in self.wallets:
+                        keys.update({("nonce", sender), ("balance", sender)})
+                    if receiver in self.wallets:
+                        keys.add(("balance", receiver))
+                    tx_key = ("tx_status", Web3.to_hex(tx['hash']).lower())
+                    if tx_key in pending:
+                        keys.add(tx_key)
+        else:
+            # ブロック本体がない場合、未確定のトランザクションはレシートを直接確認する
+            keys.update(self._pending_tx_keys())
+
+        if not self.tokens:
+            return keys
+        logs = self._w3.eth.get_logs({
+            'fromBlock': self._last_block + 1,
+            'toBlock': blocks[-1]['number'],
+            'address': [contract.address for contract in self.tokens.values()],
+            'topics': [[TRANSFER_TOPIC, APPROVAL_TOPIC]],
+        })
+        # get_logsは番号で範囲指定するため、取得済みのブロック（ヘッダーのみの場合は最新ブロック）と
+        # ハッシュが一致するか確認する（get_blockとget_logsの間にreorgが起きると別のフォークのログが混ざる）
+        hashes = {block['number']: to_hash_hex(block['hash']) for block in blocks}
+        for log in logs:
+            expected = hashes.get(log['blockNumber'])
+            if log.get('removed') or (expected is not None and to_hash_hex(log['blockHash']) != expected):
+                logger.info("別のフォークのログを取得したため全ての値を読み直します: ブロック %s", log['blockNumber'])
+                return None
+        for log in logs:
+            entry = decode_log(log)
+            if entry is None:
+                continue
+            token = entry["address"]
+            args = entry["args"]
+            if entry["event"] == "Transfer":
+                if ZERO_ADDRESS in (args["from"], args["to"]):
+                    keys.add(("total_supply", token))
+                for wallet in (args["from"], args["to"]):
+                    if wallet in self.wallets:
+                        keys.add(("token_balance", token, wallet))
+                if args["from"] in self.wallets:
+                    # transferFromはApprovalを出さずにallowanceを減らすことがある
+                    keys.update(("allowance", token, args["from"], spender) for spender in self.spenders)
+            elif entry["event"] == "Approval":
+                if args["owner"] in self.wallets and args["spender"] in self.spenders:
+                    keys.add(("allowance", token, args["owner"], args["spender"]))
+        return keys
+
+    def _refresh(self, keys, block) -> list:
+        # keysの値を指定ブロック時点で読み直し、変化したものを [(key, old, new), ...] で返す
+        changed = []
+        for key in keys:
+            new = self._fetch(key, block)
+            old = self.values.get(key)
+            if key in self.values and old == new:
+                continue
+            self.values[key] = new
+            changed.append((key, old, new))
+        return changed
+
+    def _fetch(self, key, block):
+        # 番号ではなくハッシュで指定し、読み出しを全て同じブロックに固定する
+        block_hash = Web3.to_hex(block['hash'])
+        kind = key[0]
+        if kind == "base_fee":
+            return block.get('baseFeePerGas')
+        if kind == "nonce":
+            return self._w3.eth.get_transaction_count(self.wallets[key[1]], block_hash)
+        if kind == "balance":
+            return self._w3.eth.get_balance(self.wallets[key[1]], block_hash)
+        if kind == "total_supply":
+            return self.tokens[key[1]].functions.totalSupply().call(block_identifier=block_hash)
+        if kind == "token_balance":
+            return self.tokens[key[1]].functions.balanceOf(self.wallets[key[2]]).call(block_identifier=block_hash)
+        if kind == "allowance":
+            owner, spender = self.wallets[key[2]], self.spenders[key[3]]
+            return self.tokens[key[1]].functions.allowance(owner, spender).call(block_identifier=block_hash)
+        if kind == "tx_status":
+            try:
+                return self._w3.eth.get_transaction_receipt(key[1])['status']
+            except TransactionNotFound:
+                return None
+        raise ValueError(f"不明なキーです: {key}")
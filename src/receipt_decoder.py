@@ -0,0 +1,205 @@
+import os
+import json
+from web3 import Web3
+
+# ========================================
+# トランザクションレシートのログから Transfer / Swap / RewardPaid / Withdraw などを取り出す
+# イベントABIは src/abi/ から読み、topic0（イベントシグネチャのハッシュ）を事前に計算しておく
+# データ部は全て32byte固定長の値なので、eth_abiを使わずにスライスして変換する
+# ========================================
+
+ABI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abi")
+
+# イベントABIを読み込むファイル（ファイル名, 使うイベント名）
+ABI_EVENT_SOURCES = [
+    ("usdt.json", ["Transfer", "Approval"]),
+    ("genesisRewordPool.json", ["Deposit", "Withdraw", "EmergencyWithdraw", "RewardPaid"]),
+]
+
+# SwapX（Solidly系）プールのSwapイベント（src/abi/ にないためここで定義）
+# どちらの形式のプールかはリポジトリから判別できないため、両方を登録する（引数名は同じ）
+SWAP_EVENT_ABIS = [
+    # Solidly v1 / UniswapV2 形式: Swap(address,uint256,uint256,uint256,uint256,address)
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "sender", "type": "address"},
+            {"indexed": False, "name": "amount0In", "type": "uint256"},
+            {"indexed": False, "name": "amount1In", "type": "uint256"},
+            {"indexed": False, "name": "amount0Out", "type": "uint256"},
+            {"indexed": False, "name": "amount1Out", "type": "uint256"},
+            {"indexed": True, "name": "to", "type": "address"}
+        ],
+        "name": "Swap",
+        "type": "event"
+    },
+    # Velodrome v2 形式: Swap(address,address,uint256,uint256,uint256,uint256)
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "sender", "type": "address"},
+            {"indexed": True, "name": "to", "type": "address"},
+            {"indexed": False, "name": "amount0In", "type": "uint256"},
+            {"indexed": False, "name": "amount1In", "type": "uint256"},
+            {"indexed": False, "name": "amount0Out", "type": "uint256"},
+            {"indexed": False, "name": "amount1Out", "type": "uint256"}
+        ],
+        "name": "Swap",
+        "type": "event"
+    },
+]
+
+
+def _load_event_abis() -> list:
+    events = []
+    for filename, names in ABI_EVENT_SOURCES:
+        with open(os.path.join(ABI_DIR, filename)) as f:
+            abi = json.load(f)
+        events.extend(e for e in abi if e.get("type") == "event" and e["name"] in names)
+    events.extend(SWAP_EVENT_ABIS)
+    return events
+
+
+def _build_event_table(events: list) -> dict:
+    # topic0 -> (イベント名, indexed引数[(名前, 型)], データ引数[(名前, 型)])
+    table = {}
+    for event in events:
+        signature = f"{event['name']}({','.join(i['type'] for i in event['inputs'])})"
+        topic = Web3.keccak(text=signature)
+        indexed = [(i["name"], i["type"]) for i in event["inputs"] if i.get("indexed")]
+        data = [(i["name"], i["type"]) for i in event["inputs"] if not i.get("indexed")]
+        table[bytes(topic)] = (event["name"], indexed, data)
+    return table
+
+
+EVENTS = _build_event_table(_load_event_abis())
+
+
+def to_bytes(value) -> bytes:
+    """HexBytes / bytes / hex文字列のどれでもbytesにそろえる（JSONやdictのレシートのtopic・dataにも使える）"""
+    if isinstance(value, str):
+        return Web3.to_bytes(hexstr=value)
+    return bytes(value)
+
+
+def _decode_word(word: bytes, abi_type: str):
+    # 32byteの値を型に応じて変換する（addressは小文字hexで返す）
+    if abi_type == "address":
+        return "0x" + word[12:].hex()
+    if abi_type == "bool":
+        return word[-1] == 1
+    return int.from_bytes(word, "big")
+
+
+def decode_log(log):
+    """
+    1つのログをデコードする。対象外のイベントならNoneを返す
+
+    Returns:
+        dict: {"event": イベント名, "address": 発行コントラクト(小文字), "logIndex": ..., "args": {...}}
+    """
+    topics = log["topics"]
+    if not topics:
+        return None
+    spec = EVENTS.get(to_bytes(topics[0]))
+    if spec is None:
+        return None
+    name, indexed, data_fields = spec
+    data = to_bytes(log["data"])
+    # 同じシグネチャでもindexedの数が違う（ERC721のTransferなど）場合は対象外
+    if len(topics) != len(indexed) + 1 or len(data) != 32 * len(data_fields):
+        return None
+    args = {}
+    for (arg_name, abi_type), topic in zip(indexed, topics[1:]):
+        args[arg_name] = _decode_word(to_bytes(topic), abi_type)
+    for i, (arg_name, abi_type) in enumerate(data_fields):
+        args[arg_name] = _decode_word(data[32 * i:32 * (i + 1)], abi_type)
+    return {
+        "event": name,
+        "address": log["address"].lower(),
+        "logIndex": log.get("logIndex"),
+        "args": args,
+    }
+
+
+def decode_receipt(receipt, events=None) -> list:
+    """
+    レシートの全ログをデコードする（eventsを指定した場合はそのイベント名のみ）
+    """
+    decoded = []
+    for log in receipt["logs"]:
+        entry = decode_log(log)
+        if entry is not None and (events is None or entry["event"] in events):
+            decoded.append(entry)
+    return decoded
+
+
+def received_amount(receipt, token: str, account: str) -> int:
+    """
+    レシート内のTransferから、accountが受け取ったtokenの正味量（受取 - 送付）を返す
+    ※ 同時に別のトランザクションで入金があっても影響を受けない
+    """
+    token = token.lower()
+    account = account.lower()
+    amount = 0
+    for entry in decode_receipt(receipt, ["Transfer"]):
+        if entry["address"] != token:
+            continue
+        if entry["args"]["to"] == account:
+            amount += entry["args"]["value"]
+        if entry["args"]["from"] == account:
+            amount -= entry["args"]["value"]
+    return amount
+
+
+def token_transfers(receipt, account: str) -> dict:
+    """
+    レシート内のTransferから、accountのトークンごとの正味の増減 {token: amount} を返す
+    """
+    account = account.lower()
+    transfers = {}
+    for entry in decode_receipt(receipt, ["Transfer"]):
+        args = entry["args"]
+        if args["to"] == account:
+            transfers[entry["address"]] = transfers.get(entry["address"], 0) + args["value"]
+        if args["from"] == account:
+            transfers[entry["address"]] = transfers.get(entry["address"], 0) - args["value"]
+    return transfers
+
+
+def claimed_rewards(receipt, pool: str, account: str) -> int:
+    """
+    poolが発行したRewardPaidから、accountに支払われた報酬の合計を返す
+    ※ RewardPaid(address,uint256) は他のコントラクトでもよく使われるため、発行元で絞る
+    """
+    pool = pool.lower()
+    account = account.lower()
+    return sum(
+        entry["args"]["amount"]
+        for entry in decode_receipt(receipt, ["RewardPaid"])
+        if entry["address"] == pool and entry["args"]["user"] == account
+    )
+
+
+def withdrawn_amounts(receipt, pool: str, account: str) -> dict:
+    """
+    poolが発行したWithdrawから、accountがプールごとに引き出した量 {pid: amount} を返す
+    """
+    pool = pool.lower()
+    account = account.lower()
+    amounts = {}
+    for entry in decode_receipt(receipt, ["Withdraw"]):
+        if entry["address"] == pool and entry["args"]["user"] == account:
+            pid = entry["args"]["pid"]
+            amounts[pid] = amounts.get(pid, 0) + entry["args"]["amount"]
+    return amounts
+
+
+def swaps(receipt) -> list:
+    """
+    レシート内のSwapイベント（プールごとの入出力量）のリストを返す
+    """
+    return [
+        {"pool": entry["address"], **entry["args"]}
+        for entry in decode_receipt(receipt, ["Swap"])
+    ]
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import bisect
+from array import array
+
+try:
+    import numpy as np  # あれば memmap で読み出し・集計する
+except ImportError:
+    np = None
+
+# 列の定義（列名, arrayのtypecode）。全てリトルエンディアンの固定長で列ごとに1ファイル
+# 値はuint256をそのまま保存するため、64bit x 4 (value0が下位) に分割する
+COLUMNS = [
+    ("block", "Q"),
+    ("timestamp", "Q"),
+    ("series", "I"),
+    ("value0", "Q"),
+    ("value1", "Q"),
+    ("value2", "Q"),
+    ("value3", "Q"),
+]
+VALUE_COLUMNS = ["value0", "value1", "value2", "value3"]
+UINT64_MASK = (1 << 64) - 1
+
+
+def split_uint256(value: int) -> list:
+    """uint256を下位から64bitずつの4要素に分割する"""
+    return [(value >> (64 * i)) & UINT64_MASK for i in range(4)]
+
+
+def join_uint256(limbs) -> int:
+    """split_uint256の逆変換"""
+    return sum(int(limb) << (64 * i) for i, limb in enumerate(limbs))
+
+
+def sum_uint256_limbs(limbs, groups=None, group_count: int = 1) -> list:
+    """
+    split_uint256の順（下位から）に分けたuint64の配列を合計する（numpyが必要）
+    uint64の合計はあふれるため、32bitずつに分けて合計してからPythonのintで桁をそろえる
+
+    Args:
+        limbs: uint64のnumpy配列のリスト（下位から）
+        groups: 各行のグループ番号（0 〜 group_count-1）の配列。Noneなら全体で1グループ
+        group_count (int): グループ数
+
+    Returns:
+        list: グループごとの合計
+    """
+    totals = [0] * group_count
+    for i, limb in enumerate(limbs):
+        for shift, half in ((0, limb & 0xFFFFFFFF), (32, limb >> np.uint64(32))):
+            if groups is None:
+                sums = [int(np.sum(half, dtype=np.uint64))]
+            else:
+                sums = np.zeros(group_count, dtype=np.uint64)
+                np.add.at(sums, groups, half)
+                sums = sums.tolist()
+            for group, value in enumerate(sums):
+                totals[group] += value << (64 * i + shift)
+    return totals
+
+
+class SnapshotStore:
+    """
+    ウォレット・トークンの状態（残高、nonce、totalSupply、allowanceなど）を
+    ブロックごとに追記していく列指向の時系列ストア
+
+    ・1行 = (ブロック番号, タイムスタンプ, 系列ID, uint256の値)
+    ・系列は (field, address, token) の組で、series.json に系列IDとして登録する
+    ・追記専用でブロック番号順に並ぶため、範囲検索は二分探索で行う
+    ・numpyがあれば列ファイルをmemmapで読み、集計をベクトル化する
+
+    使い方:
+        store = SnapshotStore("snapshots")
+        store.append(block_number, timestamp, [("balance", wallet, None, balance_wei)])
+        store.query("balance", wallet, from_block=100, to_block=200)
+        store.aggregate("balance", wallet)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._series_path = os.path.join(path, "series.json")
+        self._series = []
+        if os.path.exists(self._series_path):
+            with open(self._series_path) as f:
+                self._series = [tuple(s) for s in json.load(f)]
+        self._series_ids = {s: i for i, s in enumerate(self._series)}
+        self._truncate_columns()
+        blocks = self._load_column("block", "Q")
+        self._last_block = int(blocks[-1]) if len(blocks) else -1
+
+    def series(self) -> list:
+        """登録済みの系列 (field, address, token) のリスト（インデックスが系列ID）"""
+        return list(self._series)
+
+    def series_id(self, field: str, address: str, token: str = None, create: bool = False) -> int:
+        """
+        系列IDを返す。create=Trueなら未登録の系列を登録する（未登録でcreate=FalseならNone）
+        """
+        key = (field, address, token)
+        if key not in self._series_ids and create:
+            self._series_ids[key] = len(self._series)
+            self._series.append(key)
+            with open(self._series_path, "w") as f:
+                json.dump(self._series, f)
+        return self._series_ids.get(key)
+
+    def append(self, block_number: int, timestamp: int, rows):
+        """
+        1ブロック分の値を追記する
+
+        Args:
+            block_number (int): ブロック番号（前回以上であること）
+            timestamp (int): ブロックのタイムスタンプ
+            rows: (field, address, token, value) のiterable。valueは0以上のint
+        """
+        if block_number < self._last_block:
+            raise ValueError(f"ブロック番号が前回より小さいです: {block_number} < {self._last_block}")
+
+        columns = {name: array(code) for name, code in COLUMNS}
+        for field, address, token, value in rows:
+            columns["block"].append(block_number)
+            columns["timestamp"].append(timestamp)
+            columns["series"].append(self.series_id(field, address, token, create=True))
+            for name, limb in zip(VALUE_COLUMNS, split_uint256(value)):
+                columns[name].append(limb)
+
+        for name, column in columns.items():
+            if sys.byteorder == "big":
+                column.byteswap()
+            with open(self._column_path(name), "ab") as f:
+                column.tofile(f)
+        self._last_block = block_number
+
+    def query(self, field: str, address: str, token: str = None, from_block: int = None, to_block: int = None) -> list:
+        """
+        系列の値を [(block, timestamp, value), ...] で返す（from_block <= block <= to_block）
+        """
+        rows = self._select(field, address, token, from_block, to_block)
+        if rows is None:
+            return []
+        columns, index = rows
+        values = self._values(columns, index)
+        return [
+            (int(columns["block"][i]), int(columns["timestamp"][i]), value)
+            for i, value in zip(index, values)
+        ]
+
+    def aggregate(self, field: str, address: str, token: str = None, from_block: int = None, to_block: int = None) -> dict:
+        """
+        系列の集計値 {count, first, last, min, max, sum, mean} を返す（値は全てuint256の整数、meanは切り捨て）
+        """
+        rows = self._select(field, address, token, from_block, to_block)
+        if rows is None:
+            return {"count": 0}
+        columns, index = rows
+        count = len(index)
+        first = join_uint256(columns[name][index[0]] for name in VALUE_COLUMNS)
+        last = join_uint256(columns[name][index[-1]] for name in VALUE_COLUMNS)
+
+        if np is not None:
+            limbs = [np.asarray(columns[name])[index] for name in VALUE_COLUMNS]
+            # 上位の列を主キーにして並べ替え、最小・最大の行を求める
+            order = np.lexsort(limbs)
+            minimum = join_uint256(limb[order[0]] for limb in limbs)
+            maximum = join_uint256(limb[order[-1]] for limb in limbs)
+            total = sum_uint256_limbs(limbs)[0]
+        else:
+            values = self._values(columns, index)
+            minimum, maximum, total = min(values), max(values), sum(values)
+
+        return {
+            "count": count,
+            "first": first,
+            "last": last,
+            "min": minimum,
+            "max": maximum,
+            "sum": total,
+            "mean": total // count,
+        }
+
+    def _select(self, field, address, token, from_block, to_block):
+        # ブロック範囲を二分探索で絞り、系列IDが一致する行のインデックスを返す
+        sid = self.series_id(field, address, token)
+        if sid is None:
+            return None
+        columns = {name: self._load_column(name, code) for name, code in COLUMNS}
+        # 書き込み途中で止まった場合に備え、最も短い列の長さにそろえる
+        length = min(len(column) for column in columns.values())
+        blocks = columns["block"]
+        if np is not None:
+            lo = 0 if from_block is None else int(np.searchsorted(blocks[:length], from_block, side="left"))
+            hi = length if to_block is None else int(np.searchsorted(blocks[:length], to_block, side="right"))
+            index = lo + np.nonzero(columns["series"][lo:hi] == sid)[0]
+        else:
+            lo = 0 if from_block is None else bisect.bisect_left(blocks, from_block, 0, length)
+            hi = length if to_block is None else bisect.bisect_right(blocks, to_block, 0, length)
+            series = columns["series"]
+            index = [i for i in range(lo, hi) if series[i] == sid]
+        if len(index) == 0:
+            return None
+        return columns, index
+
+    def _truncate_columns(self):
+        # 追記の途中で止まった場合、列ごとに行数がずれるため、全ての列を共通の行数に切り詰める
+        # （ずれたまま追記すると、以降の行のblock・series・値の対応が全て崩れる）
+        sizes = {}
+        for name, code in COLUMNS:
+            path = self._column_path(name)
+            sizes[name] = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = min(sizes[name] // array(code).itemsize for name, code in COLUMNS)
+        for name, code in COLUMNS:
+            size = rows * array(code).itemsize
+            if sizes[name] != size:
+                with open(self._column_path(name), "r+b") as f:
+                    f.truncate(size)
+
+    def _values(self, columns, index) -> list:
+        return [join_uint256(columns[name][i] for name in VALUE_COLUMNS) for i in index]
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _load_column(self, name: str, code: str):
+        path = self._column_path(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if np is not None:
+            dtype = np.dtype(code).newbyteorder("<")
+            if size < dtype.itemsize:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="r", shape=(size // dtype.itemsize,))
+        column = array(code)
+        if size:
+            with open(path, "rb") as f:
+                column.frombytes(f.read(size - size % column.itemsize))
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column
@@ -0,0 +1,203 @@
+import logging
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# Solidly系（SwapXのstable/volatileプール）のmetadata()
+POOL_ABI = [
+    {
+        "name": "metadata",
+        "type": "function",
+        "inputs": [],
+        "outputs": [
+            {"name": "dec0", "type": "uint256"},
+            {"name": "dec1", "type": "uint256"},
+            {"name": "r0", "type": "uint256"},
+            {"name": "r1", "type": "uint256"},
+            {"name": "st", "type": "bool"},
+            {"name": "t0", "type": "address"},
+            {"name": "t1", "type": "address"}
+        ],
+        "stateMutability": "view"
+    }
+]
+
+FEE_DENOMINATOR = 10000
+ONE = 10 ** 18
+
+
+class PoolState:
+    """
+    1つのプールのリザーブと曲線（volatile: x*y=k, stable: x^3*y + y^3*x = k）
+    getAmountOutはプールコントラクトと同じ整数演算で計算する
+    """
+
+    def __init__(self, address: str, token0: str, token1: str, reserve0: int, reserve1: int,
+                 decimals0: int, decimals1: int, stable: bool, fee_bps: int):
+        """
+        Args:
+            decimals0, decimals1 (int): 10 ** decimals（metadata()のdec0, dec1と同じ形式）
+            fee_bps (int): スワップ手数料（1 = 0.01%）
+        """
+        self.address = address
+        self.token0 = Web3.to_checksum_address(token0)
+        self.token1 = Web3.to_checksum_address(token1)
+        self.reserve0 = reserve0
+        self.reserve1 = reserve1
+        self.decimals0 = decimals0
+        self.decimals1 = decimals1
+        self.stable = stable
+        self.fee_bps = fee_bps
+
+    def get_amount_out(self, amount_in: int, token_in: str) -> int:
+        """amount_in の token_in を入れた時の出力量"""
+        if amount_in <= 0:
+            return 0
+        amount_in -= amount_in * self.fee_bps // FEE_DENOMINATOR
+        token_in = Web3.to_checksum_address(token_in)
+        if token_in not in (self.token0, self.token1):
+            raise ValueError(f"{token_in} はプール {self.address} のトークンではありません")
+        is_token0 = token_in == self.token0
+        if self.stable:
+            xy = self._k(self.reserve0, self.reserve1)
+            reserve0 = self.reserve0 * ONE // self.decimals0
+            reserve1 = self.reserve1 * ONE // self.decimals1
+            reserve_a, reserve_b = (reserve0, reserve1) if is_token0 else (reserve1, reserve0)
+            amount_in = amount_in * ONE // (self.decimals0 if is_token0 else self.decimals1)
+            y = reserve_b - _get_y(amount_in + reserve_a, xy, reserve_b)
+            return y * (self.decimals1 if is_token0 else self.decimals0) // ONE
+        reserve_a, reserve_b = (self.reserve0, self.reserve1) if is_token0 else (self.reserve1, self.reserve0)
+        return amount_in * reserve_b // (reserve_a + amount_in)
+
+    def _k(self, x: int, y: int) -> int:
+        if self.stable:
+            _x = x * ONE // self.decimals0
+            _y = y * ONE // self.decimals1
+            _a = _x * _y // ONE
+            _b = _x * _x // ONE + _y * _y // ONE
+            return _a * _b // ONE
+        return x * y
+
+
+def _f(x0: int, y: int) -> int:
+    _a = x0 * y // ONE
+    _b = x0 * x0 // ONE + y * y // ONE
+    return _a * _b // ONE
+
+
+def _d(x0: int, y: int) -> int:
+    return 3 * x0 * (y * y // ONE) // ONE + (x0 * x0 // ONE * x0) // ONE
+
+
+def _get_y(x0: int, xy: int, y: int) -> int:
+    # stableプールの _get_y（ニュートン法）
+    for _ in range(255):
+        k = _f(x0, y)
+        if k < xy:
+            dy = (xy - k) * ONE // _d(x0, y)
+            if dy == 0:
+                if k == xy:
+                    return y
+                if _f(x0, y + 1) > xy:
+                    return y + 1
+                dy = 1
+            y = y + dy
+        else:
+            dy = (k - xy) * ONE // _d(x0, y)
+            if dy == 0:
+                if k == xy or _f(x0, y - 1) < xy:
+                    return y
+                dy = 1
+            y = y - dy
+    raise ValueError("_get_y が収束しませんでした")
+
+
+def fetch_pool_state(w3: Web3, pool_address: str, fee_bps: int, block_identifier='latest') -> PoolState:
+    """
+    プールのmetadata()を1回呼び、PoolStateを返す
+    """
+    pool = w3.eth.contract(address=Web3.to_checksum_address(pool_address), abi=POOL_ABI)
+    dec0, dec1, r0, r1, stable, t0, t1 = pool.functions.metadata().call(block_identifier=block_identifier)
+    return PoolState(pool.address, t0, t1, r0, r1, dec0, dec1, stable, fee_bps)
+
+
+def check_split_pools(pools: list, token_in: str, token_out: str):
+    """
+    分割スワップに使えるプールか確認する（問題があればValueError）
+    ・全てのプールが token_in / token_out のペアであること
+    ・ルーターはルートの (token_in, token_out, stable) でプールを選ぶため、stableフラグが重複しないこと
+    """
+    pair = {Web3.to_checksum_address(token_in), Web3.to_checksum_address(token_out)}
+    for pool in pools:
+        if {pool.token0, pool.token1} != pair:
+            raise ValueError(f"プール {pool.address} のペア ({pool.token0}, {pool.token1}) がスワップのペアと一致しません")
+    stable_flags = [pool.stable for pool in pools]
+    if len(set(stable_flags)) != len(stable_flags):
+        raise ValueError("stableフラグが同じプールが複数あります（ルーターがプールを区別できません）")
+
+
+def optimize_split(pools: list, token_in: str, amount_in: int, steps: int = 200, min_gain: int = 0) -> list:
+    """
+    amount_in を複数プールに分割し、合計出力が最大になる配分を求める
+    各プールの出力は入力に対して凹なので、amount_in を steps 個に分けて
+    1つずつ「追加した時の出力増加が最大のプール」に割り当てる（誤差は1ステップ分以内）
+
+    Args:
+        pools (list): 同じペアのPoolStateのリスト
+        token_in (str): 入力トークン
+        amount_in (int): 入力量（raw値）
+        steps (int): 分割数
+        min_gain (int): 分割による出力増加がこれ以下なら最良の単一プールだけを使う（追加txのガス代相当）
+
+    Returns:
+        list: [(PoolState, 入力量, 予想出力量), ...]（入力量が0のプールは含まない）
+    """
+    allocations = [0] * len(pools)
+    outputs = [0] * len(pools)
+    chunk, remainder = divmod(amount_in, steps)
+    sizes = [chunk + 1] * remainder + [chunk] * (steps - remainder)
+    gains = None
+    gain_size = None
+    for size in sizes:
+        if size == 0:
+            continue
+        if size != gain_size:
+            gains = [
+                pool.get_amount_out(allocations[i] + size, token_in) - outputs[i]
+                for i, pool in enumerate(pools)
+            ]
+            gain_size = size
+        best = max(range(len(pools)), key=gains.__getitem__)
+        allocations[best] += size
+        outputs[best] += gains[best]
+        # 割り当てたプールの次の増加分だけ計算し直す
+        gains[best] = pools[best].get_amount_out(allocations[best] + size, token_in) - outputs[best]
+
+    # 単一プールの場合と比較し、増加がmin_gain以下なら分割しない
+    single_outputs = [pool.get_amount_out(amount_in, token_in) for pool in pools]
+    best_single = max(range(len(pools)), key=single_outputs.__getitem__)
+    if sum(outputs) - single_outputs[best_single] <= min_gain:
+        logger.info("分割による増加が小さいため単一プールを使用: %s", pools[best_single].address)
+        return [(pools[best_single], amount_in, single_outputs[best_single])]
+
+    return [
+        (pool, allocation, output)
+        for pool, allocation, output in zip(pools, allocations, outputs)
+        if allocation > 0
+    ]
+
+
+def build_split_swaps(allocations: list, token_in: str, token_out: str, slippage_percent: float) -> list:
+    """
+    optimize_splitの結果から swapExactTokensForTokens の引数を作る
+
+    Returns:
+        list: [(amountIn, amountOutMin, routes), ...]
+    """
+    check_split_pools([pool for pool, _, _ in allocations], token_in, token_out)
+    swaps = []
+    for pool, amount_in, amount_out in allocations:
+        amount_out_min = amount_out * int((100 - slippage_percent) * 100) // 10000
+        routes = [(token_in, token_out, pool.stable)]
+        swaps.append((amount_in, amount_out_min, routes))
+    return swaps